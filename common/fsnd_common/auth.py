@@ -0,0 +1,313 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import os
+import threading
+import time
+from functools import wraps
+from flask import g, has_request_context, jsonify, request
+from jose import jwk, jwt
+from .jwks import JWKSError, key_provider
+from .permissions import Permissions
+from .tokens import TokenCache, Verified
+
+#----------------------------------------------------------------------------#
+# Auth0 access tokens.
+#
+# One implementation of the bearer token checks the backends used to copy
+# from each other: read the token from the Authorization header, find the
+# signing key by the token's kid, verify the RS256 signature and the
+# audience, issuer and expiry claims, then check the route's permissions.
+# The keys come from a KeyProvider (fsnd_common.jwks), verified tokens are
+# kept in a TokenCache (fsnd_common.tokens) and permissions are compiled
+# once per token (fsnd_common.permissions); each can be replaced.
+#
+# Failures raise AuthError with the code, description and status of the
+# failure, and the extension answers them as JSON with that status.
+# Every authenticated request gets the time spent in each stage (header,
+# key lookup, signature verification) in its Server-Timing header, and
+# stats() adds them up over the life of the process.
+#----------------------------------------------------------------------------#
+
+STAGES = ('header', 'keys', 'verify')
+
+
+class AuthError(Exception):
+    '''
+    AuthError(error, status_code)
+        a standardized way to communicate auth failure modes: error is
+        {'code': ..., 'description': ...}, status_code the HTTP status.
+    '''
+    def __init__(self, error, status_code):
+        super().__init__(error.get('description'))
+        self.error = error
+        self.status_code = status_code
+
+    @property
+    def code(self):
+        return self.error.get('code')
+
+
+def auth_error(code, description, status_code):
+    return AuthError({'code': code, 'description': description}, status_code)
+
+
+class AuthTiming:
+    '''
+    AuthTiming
+        seconds spent in each stage of authenticating one request, and
+        whether the token came from the cache.
+    '''
+    __slots__ = STAGES + ('cached',)
+
+    def __init__(self):
+        self.header = self.keys = self.verify = 0.0
+        self.cached = False
+
+    def server_timing(self):
+        total = self.header + self.keys + self.verify
+        entries = ['auth;dur={:.3f};desc="{}"'.format(total * 1000, 'cached' if self.cached else 'verified')]
+        entries.extend('auth-{};dur={:.3f}'.format(stage, getattr(self, stage) * 1000) for stage in STAGES)
+        return ', '.join(entries)
+
+
+class Auth:
+    '''
+    Auth(app=None, domain=None, audience=None, algorithms=None, keys=None,
+         tokens=None)
+        Flask extension checking Auth0 access tokens. Arguments left out
+        are read from the app config in init_app():
+
+        AUTH0_DOMAIN            the Auth0 tenant, e.g. 'example.eu.auth0.com'
+        API_AUDIENCE            the audience of the API
+        AUTH_ALGORITHMS         accepted signature algorithms (['RS256'])
+        AUTH0_JWKS_FILE         a local jwks.json to use instead of the
+                                tenant's endpoint (also read from the
+                                environment)
+        AUTH_TOKEN_CACHE_SIZE   verified tokens kept; 0 turns the cache
+                                off (10000)
+        AUTH_SERVER_TIMING      add the stage timings to Server-Timing
+                                (True)
+
+        keys is any fsnd_common.jwks.KeyProvider and tokens a TokenCache,
+        for other caching policies or offline keys.
+
+        auth = Auth(app, domain='example.eu.auth0.com', audience='coffeeShop')
+
+        @app.route('/drinks-detail')
+        @auth.requires_auth('get:drinks-detail')
+        def drinks_detail(payload):
+            ...
+    '''
+    def __init__(self, app=None, domain=None, audience=None, algorithms=None, keys=None, tokens=None):
+        self.domain = domain
+        self.audience = audience
+        self.algorithms = algorithms
+        self.keys = keys
+        self.tokens = tokens
+        # jose key objects by kid, built once per version of the key set
+        self.key_objects = {}
+        self.key_version = None
+        self.totals = dict((stage, [0, 0.0]) for stage in STAGES)
+        self.lock = threading.Lock()
+        self.server_timing = True
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        config.setdefault('AUTH_ALGORITHMS', ['RS256'])
+        config.setdefault('AUTH0_JWKS_FILE', os.environ.get('AUTH0_JWKS_FILE'))
+        config.setdefault('AUTH_TOKEN_CACHE_SIZE', 10000)
+        config.setdefault('AUTH_SERVER_TIMING', True)
+        self.domain = self.domain or config.get('AUTH0_DOMAIN')
+        self.audience = self.audience or config.get('API_AUDIENCE')
+        self.algorithms = self.algorithms or config['AUTH_ALGORITHMS']
+        if not self.domain or not self.audience:
+            raise ValueError('Auth needs AUTH0_DOMAIN and API_AUDIENCE')
+        if self.keys is None:
+            self.keys = key_provider(self.jwks_url, config['AUTH0_JWKS_FILE'])
+        if self.tokens is None:
+            self.tokens = TokenCache(self.keys, maxsize=config['AUTH_TOKEN_CACHE_SIZE'])
+        self.server_timing = config['AUTH_SERVER_TIMING']
+        app.register_error_handler(AuthError, self.error_response)
+        app.after_request(self.after_request)
+        app.extensions['auth'] = self
+
+    @property
+    def issuer(self):
+        return 'https://{}/'.format(self.domain)
+
+    @property
+    def jwks_url(self):
+        return 'https://{}/.well-known/jwks.json'.format(self.domain)
+
+    #------------------------------------------------------------------------#
+    # Stages.
+    #------------------------------------------------------------------------#
+
+    def get_token_auth_header(self):
+        '''
+        get_token_auth_header()
+            the token of the request's "Authorization: Bearer <token>"
+            header
+        '''
+        auth = request.headers.get('Authorization', None)
+        if not auth:
+            raise auth_error('authorization_header_missing', 'Authorization header is expected.', 401)
+        parts = auth.split()
+        if not parts:
+            raise auth_error('invalid_header', 'Authorization header must be bearer token.', 401)
+        if parts[0].lower() != 'bearer':
+            raise auth_error('invalid_header', 'Authorization header must start with "Bearer".', 401)
+        if len(parts) == 1:
+            raise auth_error('invalid_header', 'Token not found.', 401)
+        if len(parts) > 2:
+            raise auth_error('invalid_header', 'Authorization header must be bearer token.', 401)
+        return parts[1]
+
+    def key(self, kid):
+        # the jose key object of `kid`, None for an unknown kid
+        try:
+            key = self.keys.get(kid)
+        except JWKSError as error:
+            raise auth_error('jwks_unavailable', 'Unable to fetch the signing keys: {}'.format(error), 503)
+        if key is None:
+            return None
+        with self.lock:
+            if self.key_version != self.keys.version:
+                self.key_objects = {}
+                self.key_version = self.keys.version
+            key_object = self.key_objects.get(kid)
+        if key_object is None:
+            key_object = jwk.construct(key, key.get('alg', self.algorithms[0]))
+            with self.lock:
+                self.key_objects[kid] = key_object
+        return key_object
+
+    def verify_token(self, token, timing=None):
+        '''
+        verify_token(token)
+            the Verified token (payload and compiled permissions), from the
+            token cache or after checking the signature and the audience,
+            issuer and expiry claims
+        '''
+        timing = timing or AuthTiming()
+        start = time.perf_counter()
+        verified = self.tokens.get(token)
+        if verified is not None:
+            timing.cached = True
+            timing.verify += time.perf_counter() - start
+            return verified
+        try:
+            unverified_header = jwt.get_unverified_header(token)
+        except jwt.JWTError:
+            raise auth_error('invalid_header', 'Unable to parse authentication token.', 400)
+        if 'kid' not in unverified_header:
+            raise auth_error('invalid_header', 'Authorization malformed.', 401)
+        key = self.key(unverified_header['kid'])
+        looked_up = time.perf_counter()
+        timing.keys += looked_up - start
+        if key is None:
+            raise auth_error('invalid_header', 'Unable to find the appropriate key.', 400)
+        try:
+            payload = jwt.decode(token, key, algorithms=self.algorithms, audience=self.audience, issuer=self.issuer)
+        except jwt.ExpiredSignatureError:
+            raise auth_error('token_expired', 'Token expired.', 401)
+        except jwt.JWTClaimsError:
+            raise auth_error('invalid_claims', 'Incorrect claims. Please, check the audience and issuer.', 401)
+        except jwt.JWTError:
+            raise auth_error('invalid_header', 'Unable to parse authentication token.', 400)
+        finally:
+            timing.verify += time.perf_counter() - looked_up
+        verified = Verified(payload, Permissions.of(payload))
+        self.tokens.put(token, verified)
+        return verified
+
+    def verify_decode_jwt(self, token):
+        # the verified payload of `token`
+        return self.verify_token(token).payload
+
+    @staticmethod
+    def check_permissions(permission, payload, granted=None):
+        '''
+        check_permissions(permission, payload, granted=None)
+            raises AuthError unless the token grants `permission`, a string
+            or a list of permissions that are all required. granted is the
+            Permissions compiled from the payload, when known.
+        '''
+        if granted is None:
+            granted = Permissions.of(payload)
+        if granted is None:
+            raise auth_error('invalid_claims', 'Permissions not included in JWT.', 400)
+        required = [permission] if isinstance(permission, str) else permission
+        if granted.missing(required):
+            raise auth_error('unauthorized', 'Permission not found.', 403)
+        return True
+
+    def requires_auth(self, *permissions):
+        '''
+        requires_auth(*permissions)
+            view decorator: the request must carry a valid token granting
+            all of `permissions` (with none, any valid token will do). The
+            view is called with the token's payload as first argument.
+        '''
+        def decorator(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                timing = g.auth_timing = AuthTiming()
+                start = time.perf_counter()
+                try:
+                    token = self.get_token_auth_header()
+                finally:
+                    timing.header = time.perf_counter() - start
+                try:
+                    verified = self.verify_token(token, timing)
+                finally:
+                    self.record(timing)
+                if permissions:
+                    self.check_permissions(permissions, verified.payload, verified.permissions)
+                return f(verified.payload, *args, **kwargs)
+            return wrapper
+        return decorator
+
+    #------------------------------------------------------------------------#
+    # Reporting.
+    #------------------------------------------------------------------------#
+
+    def record(self, timing):
+        with self.lock:
+            for stage in STAGES:
+                seconds = getattr(timing, stage)
+                if seconds:
+                    total = self.totals[stage]
+                    total[0] += 1
+                    total[1] += seconds
+
+    def stats(self):
+        '''
+        stats()
+            {stage: {'count', 'ms'}} of the stages run since start-up,
+            with the hit/miss counters of the token cache under 'tokens'
+        '''
+        with self.lock:
+            stats = dict((stage, {'count': count, 'ms': round(seconds * 1000, 3)})
+                         for stage, (count, seconds) in self.totals.items())
+        stats['tokens'] = self.tokens.stats() if self.tokens is not None else None
+        return stats
+
+    def after_request(self, response):
+        timing = g.pop('auth_timing', None) if has_request_context() else None
+        if timing is not None and self.server_timing:
+            response.headers.add('Server-Timing', timing.server_timing())
+        return response
+
+    @staticmethod
+    def error_response(error):
+        return jsonify({
+            'success': False,
+            'error': error.status_code,
+            'code': error.code,
+            'message': error.error.get('description'),
+        }), error.status_code
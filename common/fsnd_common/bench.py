@@ -0,0 +1,20 @@
+#----------------------------------------------------------------------------#
+# Benchmark reports.
+#
+# The backends' benchmarks print their results as plain text tables, one
+# right-aligned column per measure, so runs can be compared line by line
+# and pasted into a README or a commit message as they are.
+#----------------------------------------------------------------------------#
+
+
+def report(title, columns, rows):
+    '''
+    report(title, columns, rows)
+        prints `title`, then a table of `rows` under the headers
+        `columns`, floats with two decimals.
+    '''
+    print(title)
+    print('  ' + ''.join('{:>16}'.format(c) for c in columns))
+    for row in rows:
+        print('  ' + ''.join('{:>16}'.format(
+            '{:.2f}'.format(v) if isinstance(v, float) else v) for v in row))
@@ -0,0 +1,111 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import hashlib
+import secrets
+import threading
+from functools import wraps
+from flask import current_app, request
+
+#----------------------------------------------------------------------------#
+# Conditional responses.
+#
+# Read endpoints are polled far more often than their data changes. Every
+# table gets a change counter that the model insert/update/delete methods
+# bump; the ETag of a response is derived from the counters of the tables
+# it reads. A request whose If-None-Match still matches is answered with
+# 304 Not Modified before the view runs, so no query and no serialization
+# take place.
+#----------------------------------------------------------------------------#
+
+
+class VersionStore:
+    '''
+    VersionStore
+        where the change counters live. get(table) returns the current
+        version of a table as a string, incr(table) moves it on. A shared
+        store (e.g. a redis client wrapper using INCR) lets several app
+        processes agree on versions; with the in-process LocalVersions a
+        write made by one process is not seen by the others.
+    '''
+    def get(self, table):
+        raise NotImplementedError
+
+    def incr(self, table):
+        raise NotImplementedError
+
+
+class LocalVersions(VersionStore):
+    '''
+    LocalVersions()
+        in-process counters. Versions carry a random id of the store, so
+        ETags handed out before a restart never match the counters of the
+        next run.
+    '''
+    def __init__(self):
+        self.id = secrets.token_hex(4)
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def get(self, table):
+        return '{}-{}'.format(self.id, self.counters.get(table, 0))
+
+    def incr(self, table):
+        with self.lock:
+            self.counters[table] = self.counters.get(table, 0) + 1
+
+
+class TableVersions:
+    '''
+    TableVersions(store)
+        table-level change counters.
+
+        versions.bump('drink')               after a write to the table
+        versions.etag('questions', 'categories')
+                                             the ETag of a response that
+                                             reads those tables
+    '''
+    def __init__(self, store=None):
+        self.store = store if store is not None else LocalVersions()
+
+    def bump(self, *tables):
+        for table in tables:
+            self.store.incr(table)
+
+    def etag(self, *tables):
+        token = '|'.join('{}={}'.format(table, self.store.get(table)) for table in tables)
+        return hashlib.sha1(token.encode()).hexdigest()[:20]
+
+
+def conditional(versions, *tables, cache_control='no-cache'):
+    '''
+    conditional(versions, *tables, cache_control)
+        view decorator: GET responses get the ETag of `tables` and the
+        Cache-Control header; a request whose If-None-Match matches is
+        answered with 304 without calling the view. Put it below any
+        authorization decorator, so a 304 is only sent to callers allowed
+        to see the data.
+
+        'no-cache' lets clients keep a copy but makes them revalidate it
+        on every use, which the 304 makes cheap.
+    '''
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+            # Read before the view runs: a write landing in between only
+            # makes the ETag older than the data, never newer.
+            etag = versions.etag(*tables)
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = cache_control
+            return response
+        return wrapper
+    return decorator
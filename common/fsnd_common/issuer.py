@@ -0,0 +1,206 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import argparse
+import base64
+import json
+import os
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from jose import jwt
+from .jwks import StaticKeys
+
+try:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+except ImportError:
+    # python-jose-cryptodome, as pinned by the backends, brings PyCryptodome.
+    rsa = None
+    from Crypto.PublicKey import RSA
+
+#----------------------------------------------------------------------------#
+# Offline token issuing.
+#
+# Stands in for the Auth0 tenant in tests, benchmarks and local work: an
+# RS256 key pair, its public half as a JWKS (in memory, in a file or served
+# over HTTP like /.well-known/jwks.json) and tokens with the claims Auth0
+# puts in its access tokens, with whatever permissions the caller asks
+# for. Nothing leaves the machine.
+#
+#   issuer = TokenIssuer('example.eu.auth0.com', 'coffeeShop')
+#   auth = Auth(app, domain=issuer.domain, audience=issuer.audience, keys=issuer.keys())
+#   token = issuer.mint(['get:drinks-detail'])
+#
+# From the command line, a key kept in a directory and a token for it:
+#
+#   python -m fsnd_common.issuer --domain example.eu.auth0.com --audience coffeeShop \
+#       --dir .keys get:drinks-detail post:drinks
+#   export AUTH0_JWKS_FILE=.keys/jwks.json
+#----------------------------------------------------------------------------#
+
+
+def b64(number):
+    return base64.urlsafe_b64encode(number.to_bytes((number.bit_length() + 7) // 8, 'big')).rstrip(b'=').decode()
+
+
+def rsa_key(private_key=None):
+    '''
+    rsa_key(private_key=None)
+        (PEM private key, modulus, public exponent) of the PEM private_key,
+        or of a new 2048 bit key
+    '''
+    if rsa is None:
+        key = RSA.import_key(private_key) if private_key else RSA.generate(2048)
+        return key.export_key('PEM'), key.n, key.e
+    if private_key:
+        key = serialization.load_pem_private_key(private_key, password=None)
+    else:
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        private_key = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                        serialization.NoEncryption())
+    numbers = key.public_key().public_numbers()
+    return private_key, numbers.n, numbers.e
+
+
+class TokenIssuer:
+    '''
+    TokenIssuer(domain, audience, kid=None, private_key=None)
+        an RS256 signing key and the tokens it signs, as the Auth0 tenant
+        `domain` would issue them for the API `audience`. A new 2048 bit
+        key is generated unless a PEM private_key is given.
+    '''
+    def __init__(self, domain, audience, kid=None, private_key=None):
+        self.domain = domain
+        self.audience = audience
+        self.kid = kid or uuid.uuid4().hex[:16]
+        self.private_key, n, e = rsa_key(private_key)
+        self.jwks = {'keys': [{
+            'kty': 'RSA', 'kid': self.kid, 'use': 'sig', 'alg': 'RS256',
+            'n': b64(n), 'e': b64(e),
+        }]}
+
+    @property
+    def issuer(self):
+        return 'https://{}/'.format(self.domain)
+
+    def mint(self, permissions=(), lifetime=3600, subject='offline|user', **claims):
+        '''
+        mint(permissions, lifetime=3600, subject='offline|user', **claims)
+            a signed access token granting `permissions`, valid for
+            `lifetime` seconds (negative for an expired one); claims adds or
+            overrides claims, e.g. aud='other' for a token of another API.
+        '''
+        now = int(time.time())
+        payload = {
+            'iss': self.issuer,
+            'sub': subject,
+            'aud': self.audience,
+            'iat': now,
+            'exp': now + lifetime,
+            'permissions': list(permissions),
+        }
+        payload.update(claims)
+        return jwt.encode(payload, self.private_key, algorithm='RS256', headers={'kid': self.kid})
+
+    def keys(self):
+        # a key provider holding the public key
+        return StaticKeys(self.jwks)
+
+    def write_jwks(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.jwks, f)
+        return path
+
+    @classmethod
+    def load(cls, directory, domain, audience):
+        '''
+        load(directory, domain, audience)
+            the issuer of the key kept in `directory` (key.pem, kid), made
+            and saved there on first use, with its jwks.json alongside.
+        '''
+        os.makedirs(directory, exist_ok=True)
+        key_path = os.path.join(directory, 'key.pem')
+        kid_path = os.path.join(directory, 'kid')
+        if os.path.exists(key_path):
+            with open(key_path, 'rb') as f, open(kid_path) as k:
+                issuer = cls(domain, audience, kid=k.read().strip(), private_key=f.read())
+        else:
+            issuer = cls(domain, audience)
+            with open(key_path, 'wb') as f, open(kid_path, 'w') as k:
+                f.write(issuer.private_key)
+                k.write(issuer.kid)
+            os.chmod(key_path, 0o600)
+        issuer.write_jwks(os.path.join(directory, 'jwks.json'))
+        return issuer
+
+
+class JWKSServer:
+    '''
+    JWKSServer(jwks, max_age=600)
+        serves `jwks` at http://127.0.0.1:<port>/.well-known/jwks.json with
+        Cache-Control max-age, from a background thread, for exercising
+        fsnd_common.jwks.JWKSCache without the network. requests counts
+        the key set downloads; set jwks to rotate the keys.
+
+        with JWKSServer(issuer.jwks) as server:
+            keys = JWKSCache(server.url)
+    '''
+    def __init__(self, jwks, max_age=600):
+        self.jwks = jwks
+        self.max_age = max_age
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/.well-known/jwks.json':
+                    self.send_error(404)
+                    return
+                server.requests += 1
+                body = json.dumps(server.jwks).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Cache-Control', 'public, max-age={}'.format(server.max_age))
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='jwks-server', daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/.well-known/jwks.json'.format(self.httpd.server_port)
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mint an access token signed with a local key.')
+    parser.add_argument('permissions', nargs='*', help='permissions to grant, e.g. get:drinks-detail')
+    parser.add_argument('--domain', required=True, help='Auth0 domain the API expects, e.g. example.eu.auth0.com')
+    parser.add_argument('--audience', required=True, help='audience of the API, e.g. coffeeShop')
+    parser.add_argument('--dir', default='.keys', help='where the key and jwks.json are kept (%(default)s)')
+    parser.add_argument('--lifetime', type=int, default=3600, help='seconds the token is valid (%(default)s)')
+    args = parser.parse_args()
+    issuer = TokenIssuer.load(args.dir, args.domain, args.audience)
+    print(issuer.mint(args.permissions, args.lifetime))
+
+
+if __name__ == '__main__':
+    main()
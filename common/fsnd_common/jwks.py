@@ -0,0 +1,244 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import json
+import logging
+import re
+import threading
+import time
+from urllib.request import urlopen
+
+#----------------------------------------------------------------------------#
+# JSON Web Key Sets.
+#
+# The public keys that verify the identity provider's tokens are published
+# at https://<domain>/.well-known/jwks.json. They change rarely (a key
+# rotation adds a key under a new `kid` some time before tokens are signed
+# with it), so they are fetched once and kept, indexed by kid, for as long
+# as the Cache-Control max-age of the response allows. Shortly before that
+# runs out, the next lookup starts a refresh in a background thread and
+# keeps answering from the keys it has. A token signed with a kid that is
+# not in the set triggers an immediate refetch, at most once per
+# `min_interval` seconds, so a flood of tokens with made-up kids can't turn
+# into a flood of requests to the provider.
+#----------------------------------------------------------------------------#
+
+logger = logging.getLogger(__name__)
+
+MAX_AGE = re.compile(r'max-age=(\d+)')
+
+
+class JWKSError(Exception):
+    '''
+    JWKSError
+        the key set could not be fetched or read, and there are no keys
+        from an earlier fetch to fall back on.
+    '''
+
+
+def index(jwks):
+    # {kid: key} of the signing keys of a JWKS document
+    return dict((key['kid'], key) for key in jwks.get('keys', []) if 'kid' in key)
+
+
+class KeyProvider:
+    '''
+    KeyProvider
+        where the token verification keys come from. get(kid) returns the
+        JWK of that key id, or None when there is no such key. version
+        changes whenever the set of keys does, so anything derived from
+        the keys (e.g. verified tokens) can tell it is out of date.
+        maybe_refresh() lets a user that answers from something derived
+        from the keys, without calling get(), keep them up to date; it
+        must be cheap and never block.
+    '''
+    version = 0
+
+    def get(self, kid):
+        raise NotImplementedError
+
+    def maybe_refresh(self):
+        pass
+
+
+class StaticKeys(KeyProvider):
+    '''
+    StaticKeys(jwks)
+        a fixed key set, e.g. a stub JWKS for tests or for working offline.
+        set(jwks) replaces the keys, as a rotation would.
+    '''
+    def __init__(self, jwks):
+        self.keys = {}
+        self.set(jwks)
+
+    def set(self, jwks):
+        self.keys = index(jwks)
+        self.version += 1
+
+    def get(self, kid):
+        return self.keys.get(kid)
+
+
+class FileJWKS(StaticKeys):
+    '''
+    FileJWKS(path)
+        the key set of a local JWKS file, e.g. one saved from the provider's
+        jwks.json endpoint. reload() reads the file again.
+    '''
+    def __init__(self, path):
+        self.path = path
+        super().__init__(self.read())
+
+    def read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as error:
+            raise JWKSError('cannot read {}: {}'.format(self.path, error))
+
+    def reload(self):
+        self.set(self.read())
+
+
+def fetch_jwks(url, timeout):
+    '''
+    fetch_jwks(url, timeout)
+        (JWKS document, max-age in seconds or None) of the key set at url
+    '''
+    with urlopen(url, timeout=timeout) as response:
+        match = MAX_AGE.search(response.headers.get('Cache-Control', ''))
+        return json.loads(response.read()), int(match.group(1)) if match else None
+
+
+class JWKSCache(KeyProvider):
+    '''
+    JWKSCache(url, default_max_age=600, min_max_age=60, max_max_age=86400,
+              refresh_ahead=0.8, min_interval=30, timeout=5)
+        the keys of a remote JWKS endpoint, cached.
+
+        default_max_age         seconds to keep the keys when the response
+                                has no Cache-Control max-age
+        min_max_age, max_max_age
+                                bounds of the max-age honoured
+        refresh_ahead           fraction of the max-age after which lookups
+                                start a background refresh
+        min_interval            seconds between two refetches caused by an
+                                unknown kid or a failed fetch
+        timeout                 socket timeout of a fetch
+
+        Once the max-age has run out without a successful refresh, a lookup
+        fetches the keys itself; if that fails too, the old keys stay in use
+        (and the failure is logged) rather than rejecting every token.
+    '''
+    def __init__(self, url, default_max_age=600, min_max_age=60, max_max_age=86400,
+                 refresh_ahead=0.8, min_interval=30, timeout=5, fetch=fetch_jwks, clock=time.monotonic):
+        self.url = url
+        self.default_max_age = default_max_age
+        self.min_max_age = min_max_age
+        self.max_max_age = max_max_age
+        self.refresh_ahead = refresh_ahead
+        self.min_interval = min_interval
+        self.timeout = timeout
+        self.fetch = fetch
+        self.clock = clock
+        self.keys = None
+        self.refresh_at = self.expires_at = 0.0
+        # time of the last fetch attempt, None before the first
+        self.attempted_at = None
+        self.refreshing = False
+        self.lock = threading.Lock()
+        self.first_lock = threading.Lock()
+        self.fetches = 0
+
+    def get(self, kid):
+        if self.keys is None:
+            self.first_load()
+        now = self.clock()
+        if now >= self.expires_at:
+            self.refresh(wait=True)
+        elif now >= self.refresh_at:
+            self.refresh(wait=False)
+        key = self.keys.get(kid)
+        if key is None and self.may_refetch(self.clock()):
+            # Possibly a key rotated in since the last fetch.
+            self.refresh(wait=True, force=True)
+            key = self.keys.get(kid)
+        return key
+
+    def maybe_refresh(self):
+        # Starts the background refresh a get() would start, without a
+        # lookup: verified tokens answered from a cache never call get().
+        if self.keys is not None and self.clock() >= self.refresh_at:
+            self.refresh(wait=False)
+
+    def may_refetch(self, now):
+        return self.attempted_at is None or now - self.attempted_at >= self.min_interval
+
+    def first_load(self):
+        # Concurrent first lookups wait for one fetch.
+        with self.first_lock:
+            if self.keys is not None:
+                return
+            now = self.clock()
+            if not self.may_refetch(now):
+                raise JWKSError('{} unavailable, next attempt in {:.0f} s'.format(
+                    self.url, self.min_interval - (now - self.attempted_at)))
+            with self.lock:
+                self.refreshing = True
+                self.attempted_at = now
+            self.load()
+
+    def refresh(self, wait=True, force=False):
+        '''
+        refresh(wait, force)
+            fetches the keys, in the calling thread when `wait` or else in
+            a background thread. A refresh already under way, or one sooner
+            than min_interval after the last attempt, is not repeated;
+            `force` only skips the check that the keys are still fresh.
+        '''
+        with self.lock:
+            now = self.clock()
+            if self.refreshing or not self.may_refetch(now):
+                return
+            if not force and now < (self.expires_at if wait else self.refresh_at):
+                return
+            self.refreshing = True
+            self.attempted_at = now
+        if wait:
+            self.load()
+        else:
+            threading.Thread(target=self.load, name='jwks-refresh', daemon=True).start()
+
+    def load(self):
+        try:
+            jwks, max_age = self.fetch(self.url, self.timeout)
+            keys = index(jwks)
+        except Exception as error:
+            with self.lock:
+                self.refreshing = False
+            if self.keys is None:
+                raise JWKSError('cannot fetch {}: {}'.format(self.url, error))
+            logger.warning('JWKS refresh from %s failed, keeping the cached keys: %s', self.url, error)
+            return
+        if max_age is None:
+            max_age = self.default_max_age
+        max_age = min(max(max_age, self.min_max_age), self.max_max_age)
+        now = self.clock()
+        with self.lock:
+            self.fetches += 1
+            if keys != self.keys:
+                self.keys = keys
+                self.version += 1
+            self.refresh_at = now + max_age * self.refresh_ahead
+            self.expires_at = now + max_age
+            self.refreshing = False
+
+
+def key_provider(url, path=None):
+    '''
+    key_provider(url, path)
+        the keys of the JWKS file at `path` when given, else the cached
+        keys of the JWKS endpoint at `url`
+    '''
+    return FileJWKS(path) if path else JWKSCache(url)
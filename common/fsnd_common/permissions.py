@@ -0,0 +1,61 @@
+#----------------------------------------------------------------------------#
+# Permissions.
+#
+# The `permissions` claim of an access token lists the scopes granted to
+# its holder, e.g. ['get:drinks-detail', 'post:drinks']. Permissions
+# compiles that list once per verified token into a frozenset, so checking
+# a route's permissions costs a few hash lookups however many scopes the
+# token carries. A granted scope may end in a wildcard segment:
+#
+#   'drinks:*'      every permission starting with 'drinks:', at any depth
+#   '*:drinks'      every action on drinks ('get:drinks', 'post:drinks')
+#   '*'             everything
+#----------------------------------------------------------------------------#
+
+
+class Permissions:
+    '''
+    Permissions(granted)
+        the compiled scopes of a token.
+
+        permissions.allows('post:drinks')           True or False
+        permissions.missing(['get:x', 'post:x'])    the ones not granted
+    '''
+    __slots__ = ('granted', 'prefixes', 'everything')
+
+    def __init__(self, granted):
+        granted = frozenset(granted)
+        self.everything = '*' in granted
+        self.granted = granted
+        # 'drinks:*' -> 'drinks'
+        self.prefixes = frozenset(scope[:-2] for scope in granted if scope.endswith(':*'))
+
+    @classmethod
+    def of(cls, payload):
+        # the compiled `permissions` claim of a token, None without one
+        permissions = payload.get('permissions')
+        return cls(permissions) if isinstance(permissions, list) else None
+
+    def allows(self, permission):
+        if self.everything or permission in self.granted:
+            return True
+        if ':' not in permission:
+            return False
+        head, rest = permission.split(':', 1)
+        if '*:' + rest in self.granted:
+            return True
+        if self.prefixes:
+            parts = permission.split(':')
+            for end in range(1, len(parts)):
+                if ':'.join(parts[:end]) in self.prefixes:
+                    return True
+        return False
+
+    def missing(self, required):
+        return [permission for permission in required if not self.allows(permission)]
+
+    def __contains__(self, permission):
+        return self.allows(permission)
+
+    def __repr__(self):
+        return 'Permissions({!r})'.format(sorted(self.granted))
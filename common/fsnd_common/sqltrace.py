@@ -0,0 +1,201 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# SQL instrumentation.
+#
+# Counts the statements every request runs and the time spent in the
+# database. The counters come from the engine's cursor events, so every
+# query is seen whichever code path issued it (ORM, Core, raw SQL). At the
+# end of a request the totals go into a Server-Timing header, visible in
+# the browser's network panel, and into one JSON line on the app's logger.
+# A statement executed several times in one request is reported as a
+# likely N+1 query.
+#
+# Tests pin query budgets with assert_max_queries(), which counts the
+# statements run inside a `with` block whether or not the extension is
+# installed on the app.
+#----------------------------------------------------------------------------#
+
+class QueryStats:
+    '''
+    QueryStats
+        the statements seen in one request or `with` block: their number,
+        the database time in seconds and how often each SQL string ran.
+    '''
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+
+    def repeated(self, threshold=2):
+        # [(statement, times)] of the statements run at least `threshold`
+        # times, most repeated first.
+        return [(s, n) for s, n in self.statements.most_common() if n >= threshold]
+
+    def as_dict(self):
+        return {
+            'queries': self.count,
+            'db_ms': round(self.seconds * 1000, 3),
+        }
+
+
+# assert_max_queries() blocks active in the current thread; the Flask test
+# client runs the request in the caller's thread.
+blocks = threading.local()
+
+
+def active_blocks():
+    if not hasattr(blocks, 'stack'):
+        blocks.stack = []
+    return blocks.stack
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('sqltrace_start', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('sqltrace_start')
+    if not starts:
+        return
+    seconds = time.perf_counter() - starts.pop()
+    for stats in active_blocks():
+        stats.record(statement, seconds)
+    if has_app_context():
+        stats = g.get('sqltrace')
+        if stats is not None:
+            stats.record(statement, seconds)
+
+
+def handle_error(context):
+    # A failed statement never reaches after_cursor_execute: drop its start
+    # time, or the next statement on this pooled connection would be timed
+    # from it. (A failure before before_cursor_execute leaves none to drop.)
+    if context.connection is not None:
+        starts = context.connection.info.get('sqltrace_start')
+        if starts:
+            starts.pop()
+
+
+listening = False
+listening_lock = threading.Lock()
+
+
+def listen():
+    # Listening on the Engine class covers every engine, including those
+    # Flask-SQLAlchemy only creates on first use.
+    global listening
+    with listening_lock:
+        if not listening:
+            event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+            event.listen(Engine, 'handle_error', handle_error)
+            listening = True
+
+
+class SQLTrace:
+    '''
+    SQLTrace(app)
+        Flask extension reporting the queries of every request.
+
+        SQLTRACE_ENABLED             False turns the reporting off
+        SQLTRACE_REPEAT_THRESHOLD    runs of one statement in a request
+                                     that count as an N+1 pattern (5)
+        SQLTRACE_LOG_LEVEL           level of the per-request log line
+                                     (logging.INFO; repeats log a warning)
+    '''
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SQLTRACE_ENABLED', True)
+        app.config.setdefault('SQLTRACE_REPEAT_THRESHOLD', 5)
+        app.config.setdefault('SQLTRACE_LOG_LEVEL', logging.INFO)
+        listen()
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.extensions['sqltrace'] = self
+
+    def before_request(self):
+        if current_app.config['SQLTRACE_ENABLED']:
+            g.sqltrace = QueryStats()
+
+    def after_request(self, response):
+        stats = g.pop('sqltrace', None)
+        if stats is None:
+            return response
+        config = current_app.config
+        repeated = stats.repeated(config['SQLTRACE_REPEAT_THRESHOLD'])
+        response.headers.add('Server-Timing', 'db;dur={:.3f};desc="{} queries"'.format(
+            stats.seconds * 1000, stats.count))
+        record = dict(stats.as_dict(), method=request.method, path=request.path,
+                      endpoint=request.endpoint, status=response.status_code)
+        if repeated:
+            record['repeated'] = [{'statement': s, 'times': n} for s, n in repeated]
+            current_app.logger.warning(json.dumps(record))
+        else:
+            current_app.logger.log(config['SQLTRACE_LOG_LEVEL'], json.dumps(record))
+        return response
+
+
+#----------------------------------------------------------------------------#
+# Query budgets.
+#----------------------------------------------------------------------------#
+
+@contextmanager
+def track_queries():
+    '''
+    track_queries()
+        context manager yielding a QueryStats of the statements run inside
+        the block.
+    '''
+    listen()
+    stats = QueryStats()
+    stack = active_blocks()
+    stack.append(stats)
+    try:
+        yield stats
+    finally:
+        stack.remove(stats)
+
+
+@contextmanager
+def assert_max_queries(limit, max_repeats=None):
+    '''
+    assert_max_queries(limit, max_repeats)
+        fails with an AssertionError listing the statements if the block
+        runs more than `limit` statements, or, with max_repeats, runs one
+        statement more than `max_repeats` times.
+
+        with assert_max_queries(2):
+            client.get('/questions')
+    '''
+    with track_queries() as stats:
+        yield stats
+    if stats.count > limit:
+        raise AssertionError('{} queries run, at most {} expected:\n{}'.format(
+            stats.count, limit, '\n'.join(
+                '{} x {}'.format(n, s) for s, n in stats.statements.most_common())))
+    if max_repeats is not None:
+        repeated = stats.repeated(max_repeats + 1)
+        if repeated:
+            raise AssertionError('statement repeated {} times, at most {} expected:\n{}'.format(
+                repeated[0][1], max_repeats, repeated[0][0]))
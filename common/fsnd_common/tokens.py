@@ -0,0 +1,109 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+#----------------------------------------------------------------------------#
+# Verified tokens.
+#
+# A client sends the same bearer token with every request until it expires,
+# and checking its RS256 signature is by far the most expensive part of
+# authenticating a request. TokenCache remembers the tokens that passed
+# verification, with their payload and compiled permissions, keyed by a
+# SHA-256 digest of the token (the token itself is a credential and is not
+# kept), until the token's `exp`.
+# When the key set changes (a rotation, or a key withdrawn) every entry is
+# dropped, so no token is accepted on the strength of a key that is gone.
+# Lookups also give the key provider the chance to refresh the keys when
+# they are due, since a token found here never reaches keys.get().
+#----------------------------------------------------------------------------#
+
+
+'''
+Verified(payload, permissions)
+    a verified token: its payload and the Permissions compiled from its
+    permissions claim (None when it has none)
+'''
+Verified = namedtuple('Verified', 'payload permissions')
+
+
+class TokenCache:
+    '''
+    TokenCache(keys, maxsize=10000)
+        verified tokens, for the KeyProvider `keys` that verified them. At
+        most `maxsize` entries are kept, the least recently used going
+        first; maxsize=0 disables the cache.
+
+        verified = tokens.get(token)      a Verified, or None unless the token
+                                          was verified and hasn't expired
+        tokens.put(token, verified)       after a successful verification
+        tokens.stats()                    hit/miss counters
+    '''
+    def __init__(self, keys, maxsize=10000, clock=time.time):
+        self.keys = keys
+        self.maxsize = maxsize
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.version = keys.version
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def check_version(self):
+        # Called with the lock held.
+        if self.keys.version != self.version:
+            self.entries.clear()
+            self.version = self.keys.version
+            self.invalidations += 1
+
+    def get(self, token):
+        digest = self.digest(token)
+        self.keys.maybe_refresh()
+        with self.lock:
+            self.check_version()
+            entry = self.entries.get(digest)
+            if entry is not None and entry[1] > self.clock():
+                self.entries.move_to_end(digest)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self.entries[digest]
+            self.misses += 1
+            return None
+
+    def put(self, token, verified):
+        exp = verified.payload.get('exp')
+        # Tokens without an expiry are verified every time.
+        if self.maxsize <= 0 or not isinstance(exp, (int, float)):
+            return
+        digest = self.digest(token)
+        with self.lock:
+            self.check_version()
+            self.entries[digest] = (verified, exp)
+            self.entries.move_to_end(digest)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'size': len(self.entries),
+                'invalidations': self.invalidations,
+            }
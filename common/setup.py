@@ -0,0 +1,12 @@
+from setuptools import setup, find_packages
+
+setup(
+    name='fsnd-common',
+    version='0.1.0',
+    description='Flask extensions shared by the FSND project backends',
+    packages=find_packages(),
+    install_requires=[
+        'Flask',
+        'SQLAlchemy',
+    ],
+)
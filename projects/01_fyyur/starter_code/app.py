@@ -5,16 +5,22 @@
 import json
 import dateutil.parser
 import babel
+import click
 import datetime
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify, abort
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify, abort, stream_with_context
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.dialects.postgresql import ARRAY
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
 from flask_migrate import Migrate
+from fsnd_common.sqltrace import SQLTrace
+from models import db, Venue, Artist, Show, refresh_upcoming_show_counts
+import queries
+import importer
+import exporter
+import search
+from cache import PageCache, ShowSummaryCache, LRUCache
 
 #----------------------------------------------------------------------------#
 # App Config.
@@ -23,71 +29,14 @@ from flask_migrate import Migrate
 app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
-db = SQLAlchemy(app)
+db.init_app(app)
 migrate = Migrate(app, db)
+sqltrace = SQLTrace(app)
+page_cache = PageCache(LRUCache(app.config['PAGE_CACHE_SIZE'], app.config['PAGE_CACHE_TTL']))
+show_summaries = ShowSummaryCache(queries.show_summaries, LRUCache(app.config['SHOW_SUMMARY_CACHE_SIZE'], app.config['SHOW_SUMMARY_CACHE_TTL']))
+search_backend = search.make_backend(app.config['SEARCH_BACKEND'], show_summaries)
 # DONE: connect to a local postgresql database
 
-#----------------------------------------------------------------------------#
-# Models.
-#----------------------------------------------------------------------------#
-
-
-class Venue(db.Model):
-    __tablename__ = 'Venue'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    address = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-    genres= db.Column(ARRAY(db.String()), nullable=False)
-    website=db.Column(db.String(1000),nullable=True)
-    seeking_talent=db.Column(db.Boolean, default=False)
-    seeking_description=db.Column(db.String(500), nullable=True)
-    shows = db.relationship('Show', backref='Venue', lazy=True)
-    #genres = db.relationship('Venue_Genres', backref='Venue', lazy=True)
-    def __repr__(self):
-        return f'<VENUE [ ID :{self.id} \n  NAME :{self.name} \n CITY : {self.city} \n state :{self.state} \n ADDRESS: {self.address} \n PHONE :{self.phone} \n IMAGE : {self.image_link} \n FACEBOOK : {self.facebook_link} \n SHOWS : {self.shows} \n GENRES : {self.genres}] >'
-
-    # DONE: implement any missing fields, as a database migration using Flask-Migrate
-
-
-class Artist(db.Model):
-    __tablename__ = 'Artist'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-    genres= db.Column(ARRAY(db.String()), nullable=False)
-    website=db.Column(db.String(1000),nullable=True)
-    seeking_venue=db.Column(db.Boolean, default=False)
-    seeking_description=db.Column(db.String(500), nullable=True)
-    shows = db.relationship('Show', backref='Artist', lazy=True)
-    #genres = db.relationship('Artist_Genres', backref='Artist', lazy=True)
-    # DONE: implement any missing fields, as a database migration using Flask-Migrate
-
-# DONE Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
-    def __repr__(self):
-        return f'<ARTIST [ ID :{self.id} \n  NAME :{self.name} \n CITY : {self.city} \n state :{self.state} \n PHONE :{self.phone} \n IMAGE : {self.image_link} \n FACEBOOK : {self.facebook_link} \n SHOWS : {self.shows} \n GENRES : {self.genres}] >'
-
-
-class Show(db.Model):
-    __tablename__ = 'Show'
-    id = db.Column(db.Integer, primary_key=True)
-    id_venue = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
-    id_artist = db.Column(db.Integer, db.ForeignKey(
-        'Artist.id'), nullable=False)
-    show_date = db.Column(db.DateTime, nullable=False)
-    def __repr__(self):
-      return f'<SHOW [ id: {self.id} \n id_venue: {self.id_venue} \n id_artist {self.id_artist} \n date: {self.show_date}'
-
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
@@ -104,6 +53,41 @@ def format_datetime(value, format='medium'):
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+#----------------------------------------------------------------------------#
+# Cache invalidation.
+#
+# Called by the write handlers after a successful commit. Venue and artist
+# names and images appear on each other's pages and on /shows, so an edit
+# of either drops those pages as well.
+#----------------------------------------------------------------------------#
+
+
+def venue_changed(venue_id=None):
+    page_cache.invalidate('venues')
+    page_cache.invalidate('shows')
+    page_cache.invalidate('artist')
+    if venue_id is not None:
+        page_cache.invalidate('venue', venue_id)
+        show_summaries.invalidate(Venue, venue_id)
+
+
+def artist_changed(artist_id=None):
+    page_cache.invalidate('artists')
+    page_cache.invalidate('shows')
+    page_cache.invalidate('venue')
+    if artist_id is not None:
+        page_cache.invalidate('artist', artist_id)
+        show_summaries.invalidate(Artist, artist_id)
+
+
+def show_changed(venue_id, artist_id):
+    page_cache.invalidate('venues')
+    page_cache.invalidate('shows')
+    page_cache.invalidate('venue', venue_id)
+    page_cache.invalidate('artist', artist_id)
+    show_summaries.invalidate(Venue, venue_id)
+    show_summaries.invalidate(Artist, artist_id)
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
@@ -118,18 +102,11 @@ def index():
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@page_cache.cached('venues')
 def venues():
     # DONE: replace with real venues data.
     #       num_shows should be aggregated based on number of upcoming shows per venue.
-    venues_distinct_cities = db.session.query(Venue).distinct(Venue.city).all()
-    data=[]
-    for venue_city in venues_distinct_cities:
-        venues = db.session.query(Venue).filter_by(city=venue_city.city).all()
-        list_venue=[]
-        for venue in venues:
-            upcoming_shows=[show for show in venue.shows if show.show_date>=datetime.now() ]
-            list_venue.append({'id': venue.id, 'name':venue.name,'num_upcoming_shows':len(upcoming_shows)})
-        data.append({'city':venue_city.city,'state':venue_city.state,'venues':list_venue})
+    data = queries.venue_areas(use_counters=app.config['USE_SHOW_COUNTERS'])
     return render_template('pages/venues.html', areas=data)
     
 
@@ -137,54 +114,26 @@ def venues():
 @app.route('/venues/search', methods=['POST'])
 def search_venues():
     search_term = request.form.get('search_term', '')
-    venues = Venue.query.filter(Venue.name.ilike('%'+search_term+'%')).all()
     # DONE: implement search on artists with partial string search. Ensure it is case-insensitive.
     # seach for Hop should return "The Musical Hop".
     # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
-    data=[]
-    for venue in venues:
-        upcoming_shows = [show for show in venue.shows if show.show_date>=datetime.now() ]
-        data.append({
-            "id": venue.id,
-            "name": venue.name,
-            "num_upcoming_shows": len(upcoming_shows)
-        })
-    response={"count":len(venues),"data":data}
+    data, count = search_backend.search(Venue, search_term, limit=app.config['SEARCH_LIMIT'])
+    response={"count":count,"data":data}
     return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
-#  --------------------------------------------------------------------------------------
-#  Util for formatting past and upcoming shows
-#  ---------------------------------------------------------------------------------------
-def format_show_artist(show):
-    return {"artist_id":show.id_artist,"artist_name":show.Artist.name,"artist_image_link":show.Artist.image_link,"start_time":show.show_date.strftime("%m/%d/%Y, %H:%M")}
-def format_artist_venue(show):
-    return {"venue_id":show.id_venue,"venue_name":show.Venue.name,"venue_image_link":show.Venue.image_link,"start_time":show.show_date.strftime("%m/%d/%Y, %H:%M")}
 @app.route('/venues/<int:venue_id>')
+@page_cache.cached('venue', 'venue_id')
 def show_venue(venue_id):
     # shows the venue page with the given venue_id
     # DONE: replace with real venue data from the venues table, using venue_id
-    venue = Venue.query.filter_by(id=venue_id).one_or_none()
+    past_page = request.args.get('past_page', 1, type=int)
+    upcoming_page = request.args.get('upcoming_page', 1, type=int)
+    data = queries.venue_detail(venue_id, past_limit=app.config['PAST_SHOWS_PER_PAGE'], past_page=past_page,
+                                upcoming_limit=app.config['UPCOMING_SHOWS_PER_PAGE'], upcoming_page=upcoming_page)
     error=False
-    if venue!=None:
-        past_shows = [format_show_artist(show) for show in venue.shows if show.show_date< datetime.now() ]
-        upcoming_shows=[format_show_artist(show) for show in venue.shows if show.show_date>=datetime.now() ]
-        data = {
-            "id": venue.id,
-            "name": venue.name,
-            "genres": venue.genres,
-            "address": venue.address,
-            "city": venue.city,
-            "state": venue.state,
-            "phone": venue.phone,
-            "website": venue.website,
-            "facebook_link": venue.facebook_link,
-            "seeking_talent": venue.seeking_talent,
-            "seeking_description": venue.seeking_description,
-            "image_link": venue.image_link,
-            "past_shows": past_shows,
-            "upcoming_shows": upcoming_shows,
-            "past_shows_count": len(past_shows),
-            "upcoming_shows_count": len(upcoming_shows),
-        }
+    if data!=None:
+        # The page is stale as soon as its next upcoming show starts.
+        page_cache.expire_at(data['next_show_at'])
+        show_summaries.put(Venue, venue_id, data['upcoming_shows_count'], data['next_show_at'])
         return render_template('pages/show_venue.html', venue=data)
     else: 
         error=True
@@ -219,6 +168,8 @@ def create_venue_submission():
     try:
         db.session.add(venue)
         db.session.commit()
+        search_backend.index(venue)
+        venue_changed()
         # on successful db insert, flash success
         flash('Venue ' + venue.name + ' was successfully listed!')
     except:
@@ -242,6 +193,8 @@ def delete_venue(venue_id):
         venue = Venue.query.get(venue_id)
         db.session.delete(venue)
         db.session.commit()
+        search_backend.unindex(Venue, int(venue_id))
+        venue_changed(int(venue_id))
     except:
         db.session.rollback()
         error=True
@@ -257,6 +210,7 @@ def delete_venue(venue_id):
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@page_cache.cached('artists')
 def artists():
     # DONE: replace with real data returned from querying the database
     list_artist=Artist.query.all()
@@ -272,45 +226,28 @@ def search_artists():
     # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
     # search for "band" should return "The Wild Sax Band".
     search_term = request.form.get('search_term', '')
-    artists = Artist.query.filter(Artist.name.ilike('%'+search_term+'%')).all()
-    data=[]
-    for artist in artists:
-        upcoming_shows = len([show for show in artist.shows if show.show_date>=datetime.now() ])
-        data.append({"id":artist.id,"name":artist.name,"num_upcoming_shows":upcoming_shows})
+    data, count = search_backend.search(Artist, search_term, limit=app.config['SEARCH_LIMIT'])
     response = {
-        "count": len(artists),
+        "count": count,
         "data": data
     }
     return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
 
 
 @app.route('/artists/<int:artist_id>')
+@page_cache.cached('artist', 'artist_id')
 def show_artist(artist_id):
     # shows the venue page with the given venue_id
     # DONE: replace with real venue data from the venues table, using venue_id
 
-    artist=Artist.query.filter_by(id=artist_id).one_or_none()
+    past_page = request.args.get('past_page', 1, type=int)
+    upcoming_page = request.args.get('upcoming_page', 1, type=int)
+    data = queries.artist_detail(artist_id, past_limit=app.config['PAST_SHOWS_PER_PAGE'], past_page=past_page,
+                                 upcoming_limit=app.config['UPCOMING_SHOWS_PER_PAGE'], upcoming_page=upcoming_page)
     error=False
-    if artist!=None:
-        past_shows = [format_artist_venue(show) for show in artist.shows if show.show_date< datetime.now() ]
-        upcoming_shows=[format_artist_venue(show) for show in artist.shows if show.show_date>=datetime.now() ]
-        data = {
-            "id": artist.id,
-            "name": artist.name,
-            "genres": artist.genres,
-            "city": artist.city,
-            "state": artist.state,
-            "phone": artist.phone,
-            "website": artist.website,
-            "facebook_link": artist.facebook_link,
-            "seeking_venue": artist.seeking_venue,
-            "seeking_description": artist.seeking_description,
-            "image_link": artist.image_link,
-            "past_shows": past_shows,
-            "upcoming_shows": upcoming_shows,
-            "past_shows_count": len(past_shows),
-            "upcoming_shows_count": len(upcoming_shows)
-        }
+    if data!=None:
+        page_cache.expire_at(data['next_show_at'])
+        show_summaries.put(Artist, artist_id, data['upcoming_shows_count'], data['next_show_at'])
         return render_template('pages/show_artist.html', artist=data)
     else:
         error=True
@@ -340,6 +277,8 @@ def edit_artist_submission(artist_id):
     try:
         form.populate_obj(artist)
         db.session.commit()
+        search_backend.index(artist)
+        artist_changed(artist_id)
     except:
         flash("An error has occurred, Imposible to update the artist information","error")
     finally:
@@ -372,6 +311,8 @@ def edit_venue_submission(venue_id):
         venue=Venue.query.get(venue_id)
         form.populate_obj(venue)
         db.session.commit()
+        search_backend.index(venue)
+        venue_changed(venue_id)
         return redirect(url_for('show_venue', venue_id=venue_id))
     except:
         flash("An error has occurred while updating the venue, please try again later","error")
@@ -406,6 +347,8 @@ def create_artist_submission():
     try:
         db.session.add(artist)
         db.session.commit()
+        search_backend.index(artist)
+        artist_changed()
         # on successful db insert, flash success
         flash('Artist ' + artist.name + ' was successfully listed!')
     except:
@@ -422,22 +365,18 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@page_cache.cached('shows')
 def shows():
     # displays list of shows at /shows
     # DONE: replace with real venues data.
     #       num_shows should be aggregated based on number of upcoming shows per venue.
-    shows = Show.query.all()
-    data = []
-    for show in shows:
-        data.append({
-            "venue_id": show.id_venue,
-            "venue_name":show.Venue.name,
-            "artist_id":show.id_artist,
-            "artist_name":show.Artist.name,
-            "artist_image_link":show.Artist.image_link,
-            "start_time":show.show_date.strftime("%m/%d/%Y, %H:%M")})
-    
-    return render_template('pages/shows.html', shows=data)
+    after = request.args.get('after')
+    if after is not None:
+        after = queries.decode_show_cursor(after)
+        if after is None:
+            abort(400)
+    data, next_cursor = queries.show_page(app.config['SHOWS_PER_PAGE'], after)
+    return render_template('pages/shows.html', shows=data, next_cursor=next_cursor)
 
 
 @app.route('/shows/create')
@@ -461,6 +400,7 @@ def create_show_submission():
     try:
         db.session.add(show)
         db.session.commit()
+        show_changed(int(form.venue_id.data), int(form.artist_id.data))
         # on successful db insert, flash success
         flash('Show was successfully listed!')
     except:
@@ -476,6 +416,62 @@ def create_show_submission():
     return render_template('pages/home.html')
 
 
+#  Export
+#  ----------------------------------------------------------------
+
+@app.route('/export/<kind>.<format>')
+def export(kind, format):
+    # Streams the whole table; the response is written as it is read.
+    if kind not in exporter.EXPORTS or format not in exporter.FORMATS:
+        abort(404)
+    chunks = exporter.export_chunks(kind, format)
+    return Response(stream_with_context(chunks), mimetype=exporter.FORMATS[format], headers={
+        'Content-Disposition': 'attachment; filename={}.{}'.format(kind, format)
+    })
+
+
+#  Metrics
+#  ----------------------------------------------------------------
+
+@app.route('/metrics')
+def metrics():
+    return jsonify({'page_cache': page_cache.metrics()})
+
+
+#  Commands
+#  ----------------------------------------------------------------
+
+@app.cli.command('refresh-show-counts')
+def refresh_show_counts():
+    # Recomputes Venue/Artist.upcoming_show_count; run it periodically
+    # (e.g. hourly from cron) so shows that have started stop counting.
+    refresh_upcoming_show_counts()
+
+
+@app.cli.command('import-data')
+@click.argument('kind', type=click.Choice(sorted(importer.IMPORTS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--chunk-size', default=importer.CHUNK_SIZE, show_default=True, help='Rows per transaction.')
+@click.option('--rejects', 'rejects_path', type=click.Path(dir_okay=False), help='Where to write rejected rows.')
+def import_data(kind, path, chunk_size, rejects_path):
+    # Bulk loads venues, artists or shows from a .csv or JSON lines file.
+    stats = importer.import_file(kind, path, chunk_size, rejects_path)
+    click.echo('{read} rows read, {inserted} inserted, {rejected} rejected in {seconds:.2f}s '
+               '({rows_per_second:.0f} rows/s)'.format(**stats))
+    if stats['rejects_path']:
+        click.echo('rejected rows written to {}'.format(stats['rejects_path']))
+
+
+@app.cli.command('export-data')
+@click.argument('kind', type=click.Choice(sorted(exporter.EXPORTS)))
+@click.option('--format', 'format', type=click.Choice(sorted(exporter.FORMATS)), default='ndjson', show_default=True)
+@click.option('--output', '-o', type=click.File('w'), default='-', help='Output file (default: stdout).')
+def export_data(kind, format, output):
+    # Dumps venues, artists or shows without loading the table in memory.
+    for chunk in exporter.export_chunks(kind, format):
+        output.write(chunk)
+
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -0,0 +1,65 @@
+'''
+Memory benchmark for the catalog export.
+
+Exports the Show table as NDJSON with the ORM pattern used elsewhere in the
+app (Show.query.all() and one dict per object) and with the streaming
+exporter, and reports the peak Python memory of each (tracemalloc). The
+streaming peak stays flat as the table grows; the ORM peak grows with it.
+
+    python -m benchmarks.bench_export
+'''
+import json
+import time
+import tracemalloc
+from fsnd_common.bench import report
+from benchmarks.common import make_app, seed
+from models import db, Show
+import exporter
+
+SIZES = [10000, 50000, 200000]
+
+
+def legacy_export():
+    shows = Show.query.all()
+    return ''.join(json.dumps({
+        'id': show.id,
+        'id_venue': show.id_venue,
+        'id_artist': show.id_artist,
+        'show_date': show.show_date.isoformat()
+    }) + '\n' for show in shows)
+
+
+def streaming_export():
+    # Consume the chunks the way a streaming response does.
+    size = 0
+    for chunk in exporter.export_chunks('shows', 'ndjson'):
+        size += len(chunk)
+    return size
+
+
+def peak_memory(fn):
+    db.session.expunge_all()
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = (time.perf_counter() - start) * 1000
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    db.session.expunge_all()
+    return peak / 1024 / 1024, elapsed
+
+
+def main():
+    app = make_app()
+    rows = []
+    with app.app_context():
+        for size in SIZES:
+            seed(size // 10, shows_per_venue=10)
+            legacy_mb, legacy_ms = peak_memory(legacy_export)
+            stream_mb, stream_ms = peak_memory(streaming_export)
+            rows.append((size, legacy_mb, legacy_ms, stream_mb, stream_ms))
+    report('shows NDJSON export (peak MiB)', ['shows', 'orm MiB', 'orm ms', 'stream MiB', 'stream ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
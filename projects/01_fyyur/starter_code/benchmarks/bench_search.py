@@ -0,0 +1,48 @@
+'''
+Benchmark for venue and artist name search.
+
+Compares the original ILIKE scan plus lazy-loaded shows with the in-process
+n-gram backend from search.py. The trigram backend needs Postgres and
+pg_trgm; run it by pointing make_app() at a Postgres database that has
+migration 99f8edcb6b64 applied.
+
+    python -m benchmarks.bench_search
+'''
+from datetime import datetime
+from fsnd_common.bench import report
+from benchmarks.common import make_app, seed, measure
+from config import SEARCH_LIMIT
+from models import Venue
+import search
+
+SIZES = [500, 5000, 20000]
+TERMS = ['Venue 12', 'nue 4', 'zzz']
+
+
+def legacy_search(term):
+    # The search as it was done before search.py.
+    venues = Venue.query.filter(Venue.name.ilike('%' + term + '%')).all()
+    return [{
+        "id": venue.id,
+        "name": venue.name,
+        "num_upcoming_shows": len([show for show in venue.shows if show.show_date >= datetime.now()])
+    } for venue in venues]
+
+
+def main():
+    app = make_app()
+    rows = []
+    with app.app_context():
+        for size in SIZES:
+            seed(size, shows_per_venue=2)
+            backend = search.NgramSearch()
+            backend.search(Venue, '', SEARCH_LIMIT)  # build the index outside the timings
+            for term in TERMS:
+                legacy_queries, legacy_ms = measure(lambda: legacy_search(term))
+                ngram_queries, ngram_ms = measure(lambda: backend.search(Venue, term, SEARCH_LIMIT))
+                rows.append((size, term, legacy_queries, legacy_ms, ngram_queries, ngram_ms))
+    report('venue search', ['venues', 'term', 'legacy queries', 'legacy ms', 'ngram queries', 'ngram ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+'''
+Benchmark for the /shows listing.
+
+Compares loading the whole Show table with lazy-loaded venues and artists
+against queries.show_page(), for the first page and for a page deep into
+the table. The keyset page costs the same single statement and returns the
+same number of rows at every table size.
+
+    python -m benchmarks.bench_shows
+'''
+from fsnd_common.bench import report
+from benchmarks.common import make_app, seed, measure
+from models import db, Show
+import queries
+
+SIZES = [250, 2500, 10000]
+PAGE_SIZE = 30
+
+
+def legacy_shows():
+    # The listing as it was built before queries.show_page().
+    return [{
+        "venue_id": show.id_venue,
+        "venue_name": show.Venue.name,
+        "artist_id": show.id_artist,
+        "artist_name": show.Artist.name,
+        "artist_image_link": show.Artist.image_link,
+        "start_time": show.show_date.strftime("%m/%d/%Y, %H:%M")
+    } for show in Show.query.all()]
+
+
+def main():
+    app = make_app()
+    rows = []
+    with app.app_context():
+        for size in SIZES:
+            seed(size // 4, shows_per_venue=4)
+            legacy_queries, legacy_ms = measure(legacy_shows)
+            first_queries, first_ms = measure(lambda: queries.show_page(PAGE_SIZE))
+            # A cursor half way through the table.
+            middle = db.session.query(Show.show_date, Show.id).order_by(
+                Show.show_date, Show.id).offset(size // 2).first()
+            deep_queries, deep_ms = measure(lambda: queries.show_page(PAGE_SIZE, tuple(middle)))
+            rows.append((size, legacy_queries, legacy_ms, first_queries, first_ms, deep_queries, deep_ms))
+    report('/shows listing', ['shows', 'legacy queries', 'legacy ms', 'page 1 queries', 'page 1 ms', 'deep queries', 'deep ms'], rows)
+    assert len(set(row[3] for row in rows) | set(row[5] for row in rows)) == 1, 'query count must not depend on the number of shows'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+'''
+Benchmark for the /venues listing.
+
+Compares the original per-city / per-venue loop with queries.venue_areas(),
+with and without the maintained upcoming show counters, and shows that the number of statements issued by the aggregate query stays
+constant as the number of venues grows.
+
+    python -m benchmarks.bench_venues
+'''
+from datetime import datetime
+from fsnd_common.bench import report
+from benchmarks.common import make_app, seed, measure
+from models import db, Venue
+import queries
+
+SIZES = [100, 1000, 2000]
+
+
+def legacy_venue_areas():
+    # The listing as it was built before queries.venue_areas(). DISTINCT ON
+    # is Postgres only, so the distinct cities are selected explicitly.
+    data = []
+    for venue_city in db.session.query(Venue.city, Venue.state).distinct().all():
+        venues = db.session.query(Venue).filter_by(city=venue_city.city).all()
+        list_venue = []
+        for venue in venues:
+            upcoming_shows = [show for show in venue.shows if show.show_date >= datetime.now()]
+            list_venue.append({'id': venue.id, 'name': venue.name, 'num_upcoming_shows': len(upcoming_shows)})
+        data.append({'city': venue_city.city, 'state': venue_city.state, 'venues': list_venue})
+    return data
+
+
+def main():
+    app = make_app()
+    rows = []
+    with app.app_context():
+        for size in SIZES:
+            seed(size)
+            legacy_queries, legacy_ms = measure(legacy_venue_areas)
+            new_queries, new_ms = measure(queries.venue_areas)
+            counter_queries, counter_ms = measure(lambda: queries.venue_areas(use_counters=True))
+            rows.append((size, legacy_queries, legacy_ms, new_queries, new_ms, counter_queries, counter_ms))
+    report('/venues listing', ['venues', 'legacy queries', 'legacy ms', 'queries', 'ms', 'counter queries', 'counter ms'], rows)
+    assert len(set(row[3] for row in rows)) == 1, 'query count must not depend on the number of venues'
+
+
+if __name__ == '__main__':
+    main()
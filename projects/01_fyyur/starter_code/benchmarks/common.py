@@ -0,0 +1,108 @@
+#----------------------------------------------------------------------------#
+# Shared helpers for the Fyyur benchmarks.
+#
+# The benchmarks run the real models and queries against a throwaway SQLite
+# database, so they need neither the Postgres instance from config.py nor
+# any data of their own.
+#----------------------------------------------------------------------------#
+
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from flask import Flask
+from sqlalchemy import event
+from models import db, Venue, Artist, Show, refresh_upcoming_show_counts
+
+CITIES = [
+    ('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'),
+    ('Seattle', 'WA'), ('Chicago', 'IL'), ('Boston', 'MA'),
+]
+
+
+def make_app(database_uri='sqlite://'):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed(num_venues, num_artists=None, shows_per_venue=4, seed=0):
+    '''
+    seed(num_venues)
+        fills an empty database with venues, artists and shows. Half of
+        the shows of every venue are in the past and half are upcoming.
+    '''
+    rnd = random.Random(seed)
+    num_artists = num_artists or max(1, num_venues // 2)
+    db.drop_all()
+    db.create_all()
+    now = datetime.now()
+    db.session.execute(Venue.__table__.insert(), [{
+        'id': i + 1,
+        'name': 'Venue {}'.format(i + 1),
+        'city': CITIES[i % len(CITIES)][0],
+        'state': CITIES[i % len(CITIES)][1],
+        'address': '{} Main St'.format(i + 1),
+        'image_link': 'https://example.com/venue/{}.jpg'.format(i + 1),
+        'genres': ['Jazz'],
+    } for i in range(num_venues)])
+    db.session.execute(Artist.__table__.insert(), [{
+        'id': i + 1,
+        'name': 'Artist {}'.format(i + 1),
+        'city': CITIES[i % len(CITIES)][0],
+        'state': CITIES[i % len(CITIES)][1],
+        'image_link': 'https://example.com/artist/{}.jpg'.format(i + 1),
+        'genres': ['Rock n Roll'],
+    } for i in range(num_artists)])
+    shows = []
+    for venue_id in range(1, num_venues + 1):
+        for n in range(shows_per_venue):
+            offset = timedelta(days=rnd.randint(1, 365))
+            shows.append({
+                'id_venue': venue_id,
+                'id_artist': rnd.randint(1, num_artists),
+                'show_date': now + offset if n % 2 else now - offset,
+            })
+    if shows:
+        db.session.execute(Show.__table__.insert(), shows)
+    db.session.commit()
+    refresh_upcoming_show_counts(now)
+
+
+@contextmanager
+def count_queries():
+    '''
+    count_queries()
+        counts the statements sent to the database inside the block;
+        the yielded dict holds the running total under 'count'.
+    '''
+    counter = {'count': 0}
+    engine = db.get_engine()
+
+    def before_cursor_execute(*args):
+        counter['count'] += 1
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def measure(fn, repeat=3):
+    '''
+    measure(fn)
+        runs fn `repeat` times with a clean session and returns
+        (queries per call, best wall time in milliseconds).
+    '''
+    best = None
+    for _ in range(repeat):
+        db.session.expunge_all()
+        with count_queries() as counter:
+            start = time.perf_counter()
+            fn()
+            elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return counter['count'], best
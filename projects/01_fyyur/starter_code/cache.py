@@ -0,0 +1,250 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+from flask import g, request, session
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#
+# Rendered pages only change through the create/edit/delete handlers, so
+# GET pages are cached by route, entity id and query string, and the write
+# handlers invalidate what they touched. Invalidation bumps a generation
+# number that is part of every key instead of deleting keys, which works
+# the same on a shared backend that cannot enumerate its keys; entries of
+# an old generation are never read again and age out.
+#----------------------------------------------------------------------------#
+
+
+def seconds_until(when, ttl):
+    # The shorter of `ttl` and the time left until `when`; None if neither
+    # bounds it.
+    if when is None:
+        return ttl
+    left = (when - datetime.now()).total_seconds()
+    return left if ttl is None else min(left, ttl)
+
+
+class CacheBackend:
+    '''
+    CacheBackend
+        the storage interface of the page cache. A shared backend (e.g. a
+        memcached or redis client wrapper) implements the same methods so
+        several app processes see each other's invalidations. `ttl` is the
+        default lifetime of an entry in seconds (None: no expiry).
+    '''
+    ttl = None
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def counter(self, key):
+        raise NotImplementedError
+
+    def incr(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class LRUCache(CacheBackend):
+    '''
+    LRUCache(maxsize, ttl)
+        in-process backend: at most `maxsize` entries, least recently used
+        evicted first, each entry expiring `ttl` seconds after it was set
+        (never when ttl is None).
+    '''
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        # Generation counters live outside the LRU: evicting one would
+        # resurrect the pages it invalidated.
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.time() + ttl if ttl is not None else None
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def counter(self, key):
+        return self.counters.get(key, 0)
+
+    def incr(self, key):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+            return self.counters[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.counters.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class PageCache:
+    '''
+    PageCache(backend)
+        caches the rendered body of GET views and keeps hit/miss counters
+        and the render time the hits saved.
+
+        @page_cache.cached('venue', 'venue_id')  caches a view per venue
+        page_cache.invalidate('venue', 3)         drops every page of venue 3
+        page_cache.invalidate('venue')            drops every venue page
+        page_cache.expire_at(when)                 caps the lifetime of the
+                                                   page being rendered
+    '''
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else LRUCache()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.render_seconds_saved = 0.0
+
+    def generation(self, route, entity_id=None):
+        return self.backend.counter('gen:{}:{}'.format(route, entity_id))
+
+    def key(self, route, entity_id):
+        return 'page:{}:{}:{}:{}:{}'.format(
+            route, self.generation(route), entity_id,
+            self.generation(route, entity_id), request.query_string.decode())
+
+    def invalidate(self, route, entity_id=None):
+        self.backend.incr('gen:{}:{}'.format(route, entity_id))
+        with self.lock:
+            self.invalidations += 1
+
+    def expire_at(self, when):
+        # Called by a cached view whose page goes stale at a known time,
+        # e.g. when its next upcoming show starts and becomes a past show.
+        if when is not None:
+            g.page_cache_expires_at = min(when, g.get('page_cache_expires_at', when))
+
+    def cached(self, route, entity_arg=None, ttl=None):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                # Pages render pending flash messages; those responses are
+                # for one user only.
+                if request.method != 'GET' or session.get('_flashes'):
+                    return view(*args, **kwargs)
+                key = self.key(route, kwargs.get(entity_arg))
+                entry = self.backend.get(key)
+                if entry is not None:
+                    body, render_seconds = entry
+                    with self.lock:
+                        self.hits += 1
+                        self.render_seconds_saved += render_seconds
+                    return body
+                start = time.perf_counter()
+                body = view(*args, **kwargs)
+                render_seconds = time.perf_counter() - start
+                with self.lock:
+                    self.misses += 1
+                # Redirects and error responses are not cached.
+                if isinstance(body, str):
+                    lifetime = seconds_until(g.pop('page_cache_expires_at', None), ttl or self.backend.ttl)
+                    if lifetime is None or lifetime > 0:
+                        self.backend.set(key, (body, render_seconds), lifetime)
+                return body
+            return wrapper
+        return decorator
+
+    def metrics(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'render_ms_saved': round(self.render_seconds_saved * 1000, 3),
+            }
+
+
+#----------------------------------------------------------------------------#
+# Show summaries.
+#
+# Whether a show is upcoming or past depends on the clock, so a summary of
+# a venue's or artist's upcoming shows is only valid until the next of
+# those shows starts. Entries expire exactly then instead of after a fixed
+# TTL: a summary stays cached right up to the moment one of its shows moves
+# from "upcoming" to "past".
+#----------------------------------------------------------------------------#
+
+
+class ShowSummaryCache:
+    '''
+    ShowSummaryCache(loader, backend)
+        caches (upcoming_shows_count, next_show_at) per venue or artist.
+        `loader(model, ids, now)` computes the summaries of the ids that
+        are not cached (queries.show_summaries).
+    '''
+    def __init__(self, loader, backend=None):
+        self.loader = loader
+        self.backend = backend if backend is not None else LRUCache()
+
+    def key(self, model, id):
+        return 'summary:{}:{}'.format(model.__tablename__, id)
+
+    def put(self, model, id, upcoming_shows_count, next_show_at):
+        lifetime = seconds_until(next_show_at, self.backend.ttl)
+        if lifetime is None or lifetime > 0:
+            self.backend.set(self.key(model, id), (upcoming_shows_count, next_show_at), lifetime)
+
+    def get_many(self, model, ids, now=None):
+        if now is None:
+            now = datetime.now()
+        summaries = {}
+        missing = []
+        for id in ids:
+            summary = self.backend.get(self.key(model, id))
+            # A backend with a coarser clock may hand back a summary whose
+            # next show has just started.
+            if summary is None or (summary[1] is not None and summary[1] <= now):
+                missing.append(id)
+            else:
+                summaries[id] = summary
+        for id, summary in self.loader(model, missing, now).items():
+            self.put(model, id, *summary)
+            summaries[id] = summary
+        return summaries
+
+    def invalidate(self, model, id):
+        self.backend.delete(self.key(model, id))
@@ -0,0 +1,84 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import csv
+import io
+import json
+from models import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Streaming export.
+#
+# Dumps venues, artists or shows as NDJSON or CSV without loading a table:
+# rows are read through a server-side cursor (Query.yield_per) as plain
+# column tuples, never ORM objects, and written out in chunks of CHUNK_SIZE
+# rows. Memory stays bounded by the chunk size whatever the table size.
+# Served by /export/<kind>.<format> and `flask export-data`.
+#----------------------------------------------------------------------------#
+
+EXPORTS = {
+    'venues': (Venue, ['id', 'name', 'city', 'state', 'address', 'phone', 'genres', 'image_link', 'facebook_link', 'website', 'seeking_talent', 'seeking_description']),
+    'artists': (Artist, ['id', 'name', 'city', 'state', 'phone', 'genres', 'image_link', 'facebook_link', 'website', 'seeking_venue', 'seeking_description']),
+    'shows': (Show, ['id', 'id_venue', 'id_artist', 'show_date']),
+}
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+CHUNK_SIZE = 1000
+
+
+def rows(kind, chunk_size=CHUNK_SIZE):
+    model, columns = EXPORTS[kind]
+    query = db.session.query(*[getattr(model, c) for c in columns]).order_by(model.id)
+    return columns, query.yield_per(chunk_size)
+
+
+def plain(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def ndjson_chunks(kind, chunk_size=CHUNK_SIZE):
+    columns, result = rows(kind, chunk_size)
+    lines = []
+    for row in result:
+        lines.append(json.dumps(dict(zip(columns, map(plain, row)))))
+        if len(lines) >= chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def csv_chunks(kind, chunk_size=CHUNK_SIZE):
+    # Genres are joined with ';', the format `flask import-data` reads.
+    columns, result = rows(kind, chunk_size)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    count = 0
+    for row in result:
+        writer.writerow([';'.join(v) if isinstance(v, list) else plain(v) for v in row])
+        count += 1
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_chunks(kind, format, chunk_size=CHUNK_SIZE):
+    '''
+    export_chunks(kind, format, chunk_size)
+        generator of text chunks of `kind` ('venues', 'artists' or
+        'shows') in `format` ('ndjson' or 'csv').
+    '''
+    if format == 'csv':
+        return csv_chunks(kind, chunk_size)
+    return ndjson_chunks(kind, chunk_size)
@@ -0,0 +1,232 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import csv
+import io
+import json
+import os
+import time
+from werkzeug.datastructures import MultiDict
+from forms import VenueForm, ArtistForm, ShowForm
+from models import db, Venue, Artist, Show, refresh_upcoming_show_counts
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#
+# Streams venues, artists or shows from a CSV or JSON lines file through the
+# same forms the create pages use, in chunks. Every valid chunk is inserted
+# with one batched statement (COPY on Postgres, executemany elsewhere) in a
+# transaction of its own; invalid rows go to a reject file with the reason
+# they were rejected. Run it with `flask import-data`.
+#----------------------------------------------------------------------------#
+
+# kind: (model, form, {form field: column} for fields named differently)
+IMPORTS = {
+    'venues': (Venue, VenueForm, {}),
+    'artists': (Artist, ArtistForm, {}),
+    'shows': (Show, ShowForm, {'venue_id': 'id_venue', 'artist_id': 'id_artist', 'start_time': 'show_date'}),
+}
+
+CHUNK_SIZE = 1000
+
+
+def is_csv(path):
+    return os.path.splitext(path)[1].lower() == '.csv'
+
+
+def read_records(path):
+    # CSV rows list genres separated by ';', JSON lines as a list.
+    with open(path, newline='') as f:
+        if is_csv(path):
+            for record in csv.DictReader(f):
+                if record.get('genres'):
+                    record['genres'] = [g.strip() for g in record['genres'].split(';') if g.strip()]
+                yield record
+        else:
+            for line in f:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # Rejected by validate() like any other non-object.
+                        yield line.rstrip('\n')
+
+
+def formdata(record):
+    data = MultiDict()
+    for key, value in record.items():
+        if isinstance(value, list):
+            for item in value:
+                data.add(key, str(item))
+        elif value is not None:
+            data.add(key, str(value))
+    return data
+
+
+def validate(kind, record):
+    '''
+    validate(kind, record)
+        returns (row, None) with the column values of a valid record, or
+        (None, error) describing why the form rejected it.
+    '''
+    model, form_class, columns = IMPORTS[kind]
+    if not isinstance(record, dict):
+        return None, 'not a JSON object'
+    form = form_class(formdata=formdata(record), meta={'csrf': False})
+    if not form.validate():
+        return None, '; '.join('{}: {}'.format(name, ', '.join(errors)) for name, errors in form.errors.items())
+    row = {}
+    for field in form:
+        column = columns.get(field.name, field.name)
+        if column in model.__table__.c:
+            row[column] = field.data if field.data != '' else None
+    if model is Show:
+        try:
+            row['id_venue'] = int(row['id_venue'])
+            row['id_artist'] = int(row['id_artist'])
+        except (TypeError, ValueError):
+            return None, 'venue_id and artist_id must be numbers'
+    return row, None
+
+
+def existing_ids(model, ids):
+    return set(id for id, in db.session.query(model.id).filter(model.id.in_(ids)))
+
+
+def check_references(chunk):
+    # Show rows must point at existing venues and artists; one query per
+    # table and chunk instead of letting the whole chunk fail on the FK.
+    venues = existing_ids(Venue, set(row['id_venue'] for row, record in chunk))
+    artists = existing_ids(Artist, set(row['id_artist'] for row, record in chunk))
+    valid, rejected = [], []
+    for row, record in chunk:
+        if row['id_venue'] not in venues:
+            rejected.append((record, 'venue {} does not exist'.format(row['id_venue'])))
+        elif row['id_artist'] not in artists:
+            rejected.append((record, 'artist {} does not exist'.format(row['id_artist'])))
+        else:
+            valid.append((row, record))
+    return valid, rejected
+
+
+def copy_value(value):
+    if isinstance(value, list):
+        return '{' + ','.join('"' + str(v).replace('\\', '\\\\').replace('"', '\\"') + '"' for v in value) + '}'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def copy_rows(model, rows):
+    # COPY ... FROM STDIN WITH CSV on the session's connection, so it
+    # belongs to the chunk's transaction. Unquoted empty fields are NULL.
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([copy_value(row[column]) for column in columns])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert('COPY "{}" ({}) FROM STDIN WITH CSV'.format(
+        model.__tablename__, ', '.join('"{}"'.format(c) for c in columns)), buffer)
+
+
+def insert_chunk(model, rows):
+    try:
+        if db.session.get_bind().dialect.name == 'postgresql':
+            copy_rows(model, rows)
+        else:
+            db.session.execute(model.__table__.insert(), rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+class RejectWriter:
+    '''
+    RejectWriter(path, csv_format)
+        writes rejected records with an extra `error` column (CSV) or key
+        (JSON lines). The file is only created once a record is rejected.
+    '''
+    def __init__(self, path, csv_format):
+        self.path = path
+        self.csv_format = csv_format
+        self.file = None
+        self.writer = None
+        self.count = 0
+
+    def write(self, record, error):
+        self.count += 1
+        if not isinstance(record, dict):
+            record = {'record': record}
+        record = dict(record, error=error)
+        if isinstance(record.get('genres'), list) and self.csv_format:
+            record['genres'] = ';'.join(record['genres'])
+        if self.file is None:
+            self.file = open(self.path, 'w', newline='')
+            if self.csv_format:
+                self.writer = csv.DictWriter(self.file, fieldnames=list(record), extrasaction='ignore')
+                self.writer.writeheader()
+        if self.csv_format:
+            self.writer.writerow(record)
+        else:
+            self.file.write(json.dumps(record, default=str) + '\n')
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def import_file(kind, path, chunk_size=CHUNK_SIZE, rejects_path=None):
+    '''
+    import_file(kind, path, chunk_size, rejects_path)
+        imports a file of `kind` ('venues', 'artists' or 'shows') and
+        returns a dict with the number of rows read, inserted and
+        rejected, the elapsed seconds and the rows per second.
+    '''
+    model = IMPORTS[kind][0]
+    if rejects_path is None:
+        root, ext = os.path.splitext(path)
+        rejects_path = root + '.rejects' + ext
+    rejects = RejectWriter(rejects_path, is_csv(path))
+    stats = {'read': 0, 'inserted': 0, 'rejected': 0}
+    start = time.perf_counter()
+
+    def flush(chunk):
+        if not chunk:
+            return
+        if model is Show:
+            chunk, rejected = check_references(chunk)
+            for record, error in rejected:
+                rejects.write(record, error)
+        if chunk:
+            insert_chunk(model, [row for row, record in chunk])
+            stats['inserted'] += len(chunk)
+
+    try:
+        chunk = []
+        for record in read_records(path):
+            stats['read'] += 1
+            row, error = validate(kind, record)
+            if error is not None:
+                rejects.write(record, error)
+                continue
+            chunk.append((row, record))
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+        flush(chunk)
+    finally:
+        rejects.close()
+    if model is Show and stats['inserted']:
+        # Core inserts bypass the Show listeners that keep the counters.
+        refresh_upcoming_show_counts()
+    stats['rejected'] = rejects.count
+    stats['rejects_path'] = rejects_path if rejects.count else None
+    stats['seconds'] = time.perf_counter() - start
+    stats['rows_per_second'] = stats['read'] / stats['seconds'] if stats['seconds'] else 0.0
+    return stats
@@ -0,0 +1,35 @@
+"""show indexes and upcoming show counters
+
+Revision ID: 690113739949
+Revises: 99f8edcb6b64
+Create Date: 2026-10-18 11:40:05.318226
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '690113739949'
+down_revision = '99f8edcb6b64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_venue_date', 'Show', ['id_venue', 'show_date'], unique=False)
+    op.create_index('ix_show_artist_date', 'Show', ['id_artist', 'show_date'], unique=False)
+    op.create_index('ix_show_date_id', 'Show', ['show_date', 'id'], unique=False)
+    op.add_column('Venue', sa.Column('upcoming_show_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('Artist', sa.Column('upcoming_show_count', sa.Integer(), server_default='0', nullable=False))
+    # Backfill the counters; from here on the app keeps them current.
+    op.execute('UPDATE "Venue" SET upcoming_show_count = (SELECT count(*) FROM "Show" WHERE "Show".id_venue = "Venue".id AND "Show".show_date >= now())')
+    op.execute('UPDATE "Artist" SET upcoming_show_count = (SELECT count(*) FROM "Show" WHERE "Show".id_artist = "Artist".id AND "Show".show_date >= now())')
+
+
+def downgrade():
+    op.drop_column('Artist', 'upcoming_show_count')
+    op.drop_column('Venue', 'upcoming_show_count')
+    op.drop_index('ix_show_date_id', table_name='Show')
+    op.drop_index('ix_show_artist_date', table_name='Show')
+    op.drop_index('ix_show_venue_date', table_name='Show')
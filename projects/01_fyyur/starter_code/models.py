@@ -0,0 +1,141 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import ARRAY
+
+#----------------------------------------------------------------------------#
+# Models.
+#----------------------------------------------------------------------------#
+
+db = SQLAlchemy()
+
+# Genres are a Postgres ARRAY; the JSON variant lets the benchmarks run the
+# same models against a throwaway SQLite database.
+GENRES_TYPE = ARRAY(db.String()).with_variant(db.JSON(), 'sqlite')
+
+
+class Venue(db.Model):
+    __tablename__ = 'Venue'
+    __table_args__ = (
+        # Trigram index behind name search (see search.py); plain btree
+        # outside Postgres.
+        db.Index('ix_venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    address = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    genres= db.Column(GENRES_TYPE, nullable=False)
+    website=db.Column(db.String(1000),nullable=True)
+    seeking_talent=db.Column(db.Boolean, default=False)
+    seeking_description=db.Column(db.String(500), nullable=True)
+    # Maintained by the Show listeners below, see refresh_upcoming_show_counts()
+    upcoming_show_count=db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    shows = db.relationship('Show', backref='Venue', lazy=True)
+    #genres = db.relationship('Venue_Genres', backref='Venue', lazy=True)
+    def __repr__(self):
+        return f'<VENUE [ ID :{self.id} \n  NAME :{self.name} \n CITY : {self.city} \n state :{self.state} \n ADDRESS: {self.address} \n PHONE :{self.phone} \n IMAGE : {self.image_link} \n FACEBOOK : {self.facebook_link} \n SHOWS : {self.shows} \n GENRES : {self.genres}] >'
+
+    # DONE: implement any missing fields, as a database migration using Flask-Migrate
+
+
+class Artist(db.Model):
+    __tablename__ = 'Artist'
+    __table_args__ = (
+        # Trigram index behind name search (see search.py); plain btree
+        # outside Postgres.
+        db.Index('ix_artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    genres= db.Column(GENRES_TYPE, nullable=False)
+    website=db.Column(db.String(1000),nullable=True)
+    seeking_venue=db.Column(db.Boolean, default=False)
+    seeking_description=db.Column(db.String(500), nullable=True)
+    upcoming_show_count=db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    shows = db.relationship('Show', backref='Artist', lazy=True)
+    #genres = db.relationship('Artist_Genres', backref='Artist', lazy=True)
+    # DONE: implement any missing fields, as a database migration using Flask-Migrate
+
+# DONE Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
+    def __repr__(self):
+        return f'<ARTIST [ ID :{self.id} \n  NAME :{self.name} \n CITY : {self.city} \n state :{self.state} \n PHONE :{self.phone} \n IMAGE : {self.image_link} \n FACEBOOK : {self.facebook_link} \n SHOWS : {self.shows} \n GENRES : {self.genres}] >'
+
+
+class Show(db.Model):
+    __tablename__ = 'Show'
+    __table_args__ = (
+        # Every page looks shows up by venue or artist and then by date;
+        # /shows pages through (show_date, id).
+        db.Index('ix_show_venue_date', 'id_venue', 'show_date'),
+        db.Index('ix_show_artist_date', 'id_artist', 'show_date'),
+        db.Index('ix_show_date_id', 'show_date', 'id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    id_venue = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
+    id_artist = db.Column(db.Integer, db.ForeignKey(
+        'Artist.id'), nullable=False)
+    show_date = db.Column(db.DateTime, nullable=False)
+    def __repr__(self):
+      return f'<SHOW [ id: {self.id} \n id_venue: {self.id_venue} \n id_artist {self.id_artist} \n date: {self.show_date}'
+
+
+#----------------------------------------------------------------------------#
+# Upcoming show counters.
+#
+# Venue.upcoming_show_count and Artist.upcoming_show_count are bumped in the
+# same flush that inserts or deletes an upcoming Show, so list pages can
+# read them instead of counting shows. Shows turn from upcoming into past
+# without any write, so the counters drift down over time:
+# refresh_upcoming_show_counts() (the `flask refresh-show-counts` command)
+# recomputes them and is meant to run periodically.
+#----------------------------------------------------------------------------#
+
+def bump_upcoming_show_counts(connection, show, delta):
+    if show.show_date < datetime.now():
+        return
+    for model, id in ((Venue, show.id_venue), (Artist, show.id_artist)):
+        table = model.__table__
+        connection.execute(table.update().where(table.c.id == id).values(
+            upcoming_show_count=table.c.upcoming_show_count + delta))
+
+
+@event.listens_for(Show, 'after_insert')
+def show_inserted(mapper, connection, show):
+    bump_upcoming_show_counts(connection, show, 1)
+
+
+@event.listens_for(Show, 'after_delete')
+def show_deleted(mapper, connection, show):
+    bump_upcoming_show_counts(connection, show, -1)
+
+
+def refresh_upcoming_show_counts(now=None):
+    '''
+    refresh_upcoming_show_counts(now)
+        recomputes every counter with one UPDATE per table and commits.
+    '''
+    if now is None:
+        now = datetime.now()
+    shows = Show.__table__
+    for model, owner in ((Venue, shows.c.id_venue), (Artist, shows.c.id_artist)):
+        table = model.__table__
+        count = db.select([db.func.count(shows.c.id)]).where(
+            db.and_(owner == table.c.id, shows.c.show_date >= now)).as_scalar()
+        db.session.execute(table.update().values(upcoming_show_count=count))
+    db.session.commit()
@@ -0,0 +1,289 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+from sqlalchemy import func, tuple_
+from models import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Queries.
+#
+# Read-side helpers for the controllers in app.py. Each one builds the dict
+# structure its template expects from a fixed number of SQL statements, so
+# the cost of a page does not grow with the number of venues, artists or
+# shows behind it.
+#----------------------------------------------------------------------------#
+
+
+def upcoming_shows_count(now):
+    # COUNT(Show.id) FILTER (WHERE Show.show_date >= now): Show rows missing
+    # from an outer join have a NULL id and are not counted.
+    return func.count(Show.id).filter(Show.show_date >= now)
+
+
+def past_shows_count(now):
+    return func.count(Show.id).filter(Show.show_date < now)
+
+
+def format_start_time(show_date):
+    return show_date.strftime("%m/%d/%Y, %H:%M")
+
+
+def show_summaries(model, ids, now):
+    '''
+    show_summaries(model, ids, now)
+        upcoming show count and start of the next show for each of the
+        given venue or artist ids, from one grouped query.
+    '''
+    owner = Show.id_venue if model is Venue else Show.id_artist
+    summaries = dict((id, (0, None)) for id in ids)
+    if ids:
+        rows = db.session.query(owner, func.count(Show.id), func.min(Show.show_date)).filter(
+            owner.in_(ids), Show.show_date >= now).group_by(owner).all()
+        for id, count, next_show_at in rows:
+            summaries[id] = (count, next_show_at)
+    return summaries
+
+
+def shows_with(model, owner_column, owner_id, now, upcoming, limit=None, offset=0):
+    '''
+    shows_with(model, owner_column, owner_id, now, upcoming)
+        the upcoming (or past) shows of one venue or artist, joined with
+        the other side of the show (`model`) and projected to the columns
+        the detail pages render. Upcoming shows come soonest first, past
+        shows most recent first.
+    '''
+    other_id = Show.id_artist if model is Artist else Show.id_venue
+    query = db.session.query(
+        other_id.label('id'),
+        model.name,
+        model.image_link,
+        Show.show_date
+    ).join(model, model.id == other_id).filter(owner_column == owner_id)
+    if upcoming:
+        query = query.filter(Show.show_date >= now).order_by(Show.show_date, Show.id)
+    else:
+        query = query.filter(Show.show_date < now).order_by(Show.show_date.desc(), Show.id.desc())
+    if limit is not None:
+        query = query.limit(limit).offset(offset)
+    return query.all()
+
+
+def page_offset(limit, page):
+    return (page - 1) * limit if limit is not None else 0
+
+
+def detail(model, owner_column, entity_id, now, past_limit, past_page, upcoming_limit, upcoming_page):
+    # One query for the entity, both show counts and the start of the next
+    # show, then one bounded query per show list, all against the same
+    # reference timestamp.
+    if now is None:
+        now = datetime.now()
+    row = db.session.query(
+        model,
+        upcoming_shows_count(now).label('upcoming_shows_count'),
+        past_shows_count(now).label('past_shows_count'),
+        func.min(Show.show_date).filter(Show.show_date >= now).label('next_show_at')
+    ).outerjoin(Show, owner_column == model.id).filter(
+        model.id == entity_id
+    ).group_by(model.id).one_or_none()
+    if row is None:
+        return None
+    other = Artist if model is Venue else Venue
+    past_page = max(past_page, 1)
+    upcoming_page = max(upcoming_page, 1)
+    past_offset = page_offset(past_limit, past_page)
+    upcoming_offset = page_offset(upcoming_limit, upcoming_page)
+    upcoming_shows = shows_with(other, owner_column, entity_id, now, True, upcoming_limit, upcoming_offset)
+    past_shows = shows_with(other, owner_column, entity_id, now, False, past_limit, past_offset)
+    more_past_shows = past_offset + len(past_shows) < row.past_shows_count
+    more_upcoming_shows = upcoming_offset + len(upcoming_shows) < row.upcoming_shows_count
+    return row[0], {
+        "past_shows": past_shows,
+        "upcoming_shows": upcoming_shows,
+        "past_shows_count": row.past_shows_count,
+        "upcoming_shows_count": row.upcoming_shows_count,
+        "next_show_at": row.next_show_at,
+        "past_shows_page": past_page,
+        "past_shows_next_page": past_page + 1 if more_past_shows else None,
+        "upcoming_shows_page": upcoming_page,
+        "upcoming_shows_next_page": upcoming_page + 1 if more_upcoming_shows else None
+    }
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+def venue_areas(now=None, use_counters=False):
+    '''
+    venue_areas(now, use_counters)
+        builds the /venues listing: a list of areas (city, state) with
+        their venues and the number of upcoming shows of each venue.
+        The whole structure comes from a single grouped query, or from a
+        plain scan of Venue when use_counters reads the maintained
+        Venue.upcoming_show_count instead of counting shows.
+    '''
+    if use_counters:
+        query = db.session.query(
+            Venue.city,
+            Venue.state,
+            Venue.id,
+            Venue.name,
+            Venue.upcoming_show_count.label('num_upcoming_shows')
+        )
+    else:
+        if now is None:
+            now = datetime.now()
+        query = db.session.query(
+            Venue.city,
+            Venue.state,
+            Venue.id,
+            Venue.name,
+            upcoming_shows_count(now).label('num_upcoming_shows')
+        ).outerjoin(Show, Show.id_venue == Venue.id).group_by(Venue.id)
+    rows = query.order_by(Venue.city, Venue.state, Venue.id).all()
+
+    areas = []
+    area = None
+    for row in rows:
+        if area is None or (area['city'], area['state']) != (row.city, row.state):
+            area = {'city': row.city, 'state': row.state, 'venues': []}
+            areas.append(area)
+        area['venues'].append({
+            'id': row.id,
+            'name': row.name,
+            'num_upcoming_shows': row.num_upcoming_shows
+        })
+    return areas
+
+
+def venue_detail(venue_id, now=None, past_limit=None, past_page=1, upcoming_limit=None, upcoming_page=1):
+    '''
+    venue_detail(venue_id)
+        the data for the venue page, or None if the venue does not exist.
+        past_limit/past_page and upcoming_limit/upcoming_page page through
+        the past and upcoming shows, so neither the history of an old
+        venue nor a long booked-out season is ever loaded in full.
+    '''
+    found = detail(Venue, Show.id_venue, venue_id, now, past_limit, past_page, upcoming_limit, upcoming_page)
+    if found is None:
+        return None
+    venue, shows = found
+    data = {
+        "id": venue.id,
+        "name": venue.name,
+        "genres": venue.genres,
+        "address": venue.address,
+        "city": venue.city,
+        "state": venue.state,
+        "phone": venue.phone,
+        "website": venue.website,
+        "facebook_link": venue.facebook_link,
+        "seeking_talent": venue.seeking_talent,
+        "seeking_description": venue.seeking_description,
+        "image_link": venue.image_link,
+    }
+    data.update(shows)
+    for key in ("past_shows", "upcoming_shows"):
+        data[key] = [{
+            "artist_id": show.id,
+            "artist_name": show.name,
+            "artist_image_link": show.image_link,
+            "start_time": format_start_time(show.show_date)
+        } for show in data[key]]
+    return data
+
+
+#  Artists
+#  ----------------------------------------------------------------
+
+def artist_detail(artist_id, now=None, past_limit=None, past_page=1, upcoming_limit=None, upcoming_page=1):
+    '''
+    artist_detail(artist_id)
+        the data for the artist page, or None if the artist does not
+        exist. Paging works as in venue_detail().
+    '''
+    found = detail(Artist, Show.id_artist, artist_id, now, past_limit, past_page, upcoming_limit, upcoming_page)
+    if found is None:
+        return None
+    artist, shows = found
+    data = {
+        "id": artist.id,
+        "name": artist.name,
+        "genres": artist.genres,
+        "city": artist.city,
+        "state": artist.state,
+        "phone": artist.phone,
+        "website": artist.website,
+        "facebook_link": artist.facebook_link,
+        "seeking_venue": artist.seeking_venue,
+        "seeking_description": artist.seeking_description,
+        "image_link": artist.image_link,
+    }
+    data.update(shows)
+    for key in ("past_shows", "upcoming_shows"):
+        data[key] = [{
+            "venue_id": show.id,
+            "venue_name": show.name,
+            "venue_image_link": show.image_link,
+            "start_time": format_start_time(show.show_date)
+        } for show in data[key]]
+    return data
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+def encode_show_cursor(show_date, show_id):
+    return '{}_{}'.format(show_date.isoformat(), show_id)
+
+
+def decode_show_cursor(cursor):
+    '''
+    decode_show_cursor(cursor)
+        the (show_date, id) pair a /shows cursor points after, or None if
+        the cursor is malformed.
+    '''
+    try:
+        show_date, show_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(show_date), int(show_id)
+    except ValueError:
+        return None
+
+
+def show_page(limit, after=None):
+    '''
+    show_page(limit, after)
+        one page of the /shows listing ordered by (show_date, id), starting
+        right after the (show_date, id) pair `after`. Keyset pagination
+        keeps every page a single indexed range scan, however deep it is.
+        Returns the shows and the cursor of the next page (None on the
+        last page).
+    '''
+    query = db.session.query(
+        Show.id,
+        Show.id_venue,
+        Venue.name.label('venue_name'),
+        Show.id_artist,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        Show.show_date
+    ).join(Venue, Venue.id == Show.id_venue).join(Artist, Artist.id == Show.id_artist)
+    if after is not None:
+        query = query.filter(tuple_(Show.show_date, Show.id) > tuple_(*after))
+    # One extra row tells whether there is a next page.
+    rows = query.order_by(Show.show_date, Show.id).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_show_cursor(rows[-1].show_date, rows[-1].id)
+    shows = [{
+        "venue_id": row.id_venue,
+        "venue_name": row.venue_name,
+        "artist_id": row.id_artist,
+        "artist_name": row.artist_name,
+        "artist_image_link": row.artist_image_link,
+        "start_time": format_start_time(row.show_date)
+    } for row in rows]
+    return shows, next_cursor
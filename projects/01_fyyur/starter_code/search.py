@@ -0,0 +1,172 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import heapq
+from datetime import datetime
+from sqlalchemy import func
+from models import db
+from queries import show_summaries
+
+#----------------------------------------------------------------------------#
+# Search.
+#
+# Case-insensitive substring search on Venue.name and Artist.name. Two
+# interchangeable backends match the same rows, but may rank them
+# differently: TrigramSearch by word_similarity(), NgramSearch by the share
+# of the name the term covers.
+#
+#   TrigramSearch  - Postgres; the ILIKE filter is served by the pg_trgm GIN
+#                    indexes from migration 99f8edcb6b64 and ranked by
+#                    word_similarity().
+#   NgramSearch    - in process; an n-gram inverted index over the names,
+#                    for SQLite and tests where pg_trgm is not available.
+#
+# Both count the upcoming shows of the returned page in a single query, or
+# read them from a ShowSummaryCache (cache.py) when one is given.
+#----------------------------------------------------------------------------#
+
+def escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class SearchBackend:
+    '''
+    SearchBackend
+        search(model, term, limit) returns (results, count): at most `limit`
+        dicts with id, name and num_upcoming_shows, best match first, and
+        the total number of matches. The index hooks are called by the
+        write handlers after a successful commit; backends that read the
+        database directly ignore them.
+    '''
+    def __init__(self, summaries=None):
+        self.summaries = summaries
+
+    def search(self, model, term, limit, now=None):
+        raise NotImplementedError
+
+    def results(self, model, page, now):
+        # page: [(id, name)] in rank order
+        ids = [id for id, name in page]
+        if self.summaries is not None:
+            summaries = self.summaries.get_many(model, ids, now)
+        else:
+            summaries = show_summaries(model, ids, now)
+        return [{
+            "id": id,
+            "name": name,
+            "num_upcoming_shows": summaries[id][0]
+        } for id, name in page]
+
+    def index(self, instance):
+        pass
+
+    def unindex(self, model, id):
+        pass
+
+    def reset(self):
+        pass
+
+
+class TrigramSearch(SearchBackend):
+
+    def search(self, model, term, limit, now=None):
+        if now is None:
+            now = datetime.now()
+        rows = db.session.query(
+            model.id,
+            model.name,
+            func.count().over().label('total')
+        ).filter(
+            model.name.ilike('%' + escape_like(term) + '%', escape='\\')
+        ).order_by(
+            func.word_similarity(term, model.name).desc(), model.name, model.id
+        ).limit(limit).all()
+        page = [(row.id, row.name) for row in rows]
+        return self.results(model, page, now), rows[0].total if rows else 0
+
+
+class NgramSearch(SearchBackend):
+    '''
+    NgramSearch
+        keeps, per model, every name and an inverted index from each of its
+        lowercase n-grams (n <= NGRAM) to the ids containing it. A term is
+        looked up by intersecting the postings of its n-grams, so only
+        candidate names are compared against the term. The index is built
+        from the database on first use.
+    '''
+    NGRAM = 3
+
+    def __init__(self, summaries=None):
+        super().__init__(summaries)
+        self.reset()
+
+    def reset(self):
+        self.names = {}
+        self.postings = {}
+
+    def grams(self, text):
+        n = min(self.NGRAM, len(text))
+        return set(text[i:i + n] for i in range(len(text) - n + 1))
+
+    def all_grams(self, text):
+        grams = set()
+        for n in range(1, self.NGRAM + 1):
+            grams.update(text[i:i + n] for i in range(len(text) - n + 1))
+        return grams
+
+    def load(self, model):
+        if model not in self.names:
+            self.names[model] = {}
+            self.postings[model] = {}
+            for id, name in db.session.query(model.id, model.name):
+                self.add(model, id, name)
+        return self.names[model], self.postings[model]
+
+    def add(self, model, id, name):
+        names, postings = self.names[model], self.postings[model]
+        names[id] = name or ''
+        for gram in self.all_grams(names[id].lower()):
+            postings.setdefault(gram, set()).add(id)
+
+    def index(self, instance):
+        model = type(instance)
+        if model in self.names:
+            self.unindex(model, instance.id)
+            self.add(model, instance.id, instance.name)
+
+    def unindex(self, model, id):
+        if model not in self.names or id not in self.names[model]:
+            return
+        postings = self.postings[model]
+        for gram in self.all_grams(self.names[model].pop(id).lower()):
+            ids = postings.get(gram)
+            ids.discard(id)
+            if not ids:
+                del postings[gram]
+
+    def search(self, model, term, limit, now=None):
+        if now is None:
+            now = datetime.now()
+        names, postings = self.load(model)
+        needle = term.lower()
+        if needle:
+            postings_lists = sorted((postings.get(gram, set()) for gram in self.grams(needle)), key=len)
+            candidates = set.intersection(*postings_lists)
+        else:
+            candidates = names.keys()
+        matches = [id for id in candidates if needle in names[id].lower()]
+        # Rank by how much of the name the term covers, like word_similarity.
+        page = heapq.nsmallest(limit, matches, key=lambda id: (-len(needle) / max(len(names[id]), 1), names[id], id))
+        page = [(id, names[id]) for id in page]
+        return self.results(model, page, now), len(matches)
+
+
+BACKENDS = {
+    'trigram': TrigramSearch,
+    'ngram': NgramSearch,
+}
+
+
+def make_backend(name, summaries=None):
+    return BACKENDS[name](summaries)
@@ -0,0 +1,74 @@
+'''
+Benchmark for loading and removing question packs.
+
+Compares one Question.insert()/delete() per question, the path behind
+POST /questions and DELETE /questions/<id>, with the batched single
+transaction of flaskr/bulk.py behind POST and DELETE /questions/bulk.
+The database is a SQLite file, so every commit pays for a real sync to
+disk as it would on a server.
+
+    python -m benchmarks.bench_bulk [sizes...]
+'''
+import os
+import sys
+import tempfile
+import time
+from fsnd_common.bench import report
+from benchmarks.common import make_app, seed
+from models import db, Question
+from flaskr.bulk import create_questions, delete_questions
+
+SIZES = [100, 1000, 5000]
+
+
+def pack(size):
+    return [{
+        'question': 'Pack question {}?'.format(i),
+        'answer': 'Answer {}'.format(i),
+        'category': i % 6 + 1,
+        'difficulty': i % 5 + 1,
+    } for i in range(size)]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def single_insert(items):
+    ids = []
+    for item in items:
+        question = Question(**item)
+        question.insert()
+        ids.append(question.id)
+    return ids
+
+
+def single_delete(ids):
+    for id in ids:
+        Question.query.get(id).delete()
+
+
+def main(sizes):
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    app = make_app('sqlite:///' + path)
+    rows = []
+    try:
+        with app.app_context():
+            seed(0)
+            for size in sizes:
+                items = pack(size)
+                ids, single_in = timed(lambda: single_insert(items))
+                _, single_out = timed(lambda: single_delete(ids))
+                results, bulk_in = timed(lambda: create_questions(items))
+                _, bulk_out = timed(lambda: delete_questions([result['id'] for result in results]))
+                rows.append((size, size / single_in, size / bulk_in, size / single_out, size / bulk_out))
+    finally:
+        os.remove(path)
+    report('questions per second', ['questions', 'single insert', 'bulk insert', 'single delete', 'bulk delete'], rows)
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or SIZES)
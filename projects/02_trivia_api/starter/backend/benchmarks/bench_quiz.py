@@ -0,0 +1,52 @@
+'''
+Benchmark for picking the next /quizzes question.
+
+Compares the ORDER BY random() query with NOT IN (previous_questions) the
+endpoint used to run against flaskr.quiz.next_question(), for question
+banks of 10k to 1M questions and games of up to 500 previous answers. The
+id arrays are loaded once per bank (the "load ms" column); after that a
+question is one primary key lookup.
+
+    python -m benchmarks.bench_quiz [sizes...]
+'''
+import random
+import sys
+import time
+from sqlalchemy import func
+from fsnd_common.bench import report
+from benchmarks.common import make_app, seed, measure
+from models import Question
+from flaskr.quiz import next_question, question_ids
+
+SIZES = [10000, 100000, 1000000]
+PREVIOUS = [0, 100, 500]
+CATEGORY = 5
+
+
+def order_by_random(category, previous_questions):
+    # The query /quizzes ran before flaskr.quiz.
+    return Question.query.filter(
+        Question.id.notin_(previous_questions), Question.category == category
+    ).order_by(func.random()).first()
+
+
+def main(sizes):
+    app = make_app()
+    rows = []
+    with app.app_context():
+        for size in sizes:
+            seed(size)
+            question_ids.invalidate()
+            start = time.perf_counter()
+            ids = question_ids.of(CATEGORY)
+            load_ms = (time.perf_counter() - start) * 1000
+            for num_previous in PREVIOUS:
+                previous = random.Random(num_previous).sample(ids, num_previous)
+                random_queries, random_ms = measure(lambda: order_by_random(CATEGORY, previous))
+                quiz_queries, quiz_ms = measure(lambda: next_question(CATEGORY, previous), repeat=20)
+                rows.append((size, num_previous, random_queries, random_ms, load_ms, quiz_queries, quiz_ms))
+    report('/quizzes next question', ['questions', 'previous', 'random queries', 'random ms', 'load ms', 'quiz queries', 'quiz ms'], rows)
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or SIZES)
@@ -0,0 +1,53 @@
+'''
+Benchmark for the question search.
+
+Compares the ILIKE '%term%' scan the search endpoint used to run against
+the in-process inverted index of flaskr/search.py (the SQLite backend),
+for one-word, prefix and two-word terms. The scan reads every question;
+the index only touches the words of the term and their matches, so its
+time follows the number of matches rather than the size of the bank. The
+index is built once per bank ("build ms").
+
+    python -m benchmarks.bench_search [sizes...]
+'''
+import sys
+import time
+from fsnd_common.bench import report
+from benchmarks.common import make_app, seed, measure
+from models import Question
+from flaskr.search import IndexSearch, QuestionIndex
+
+SIZES = [10000, 100000, 300000]
+PER_PAGE = 10
+
+
+def ilike_search(term):
+    # The search as it was before flaskr/search.py.
+    questions = [question.format() for question in
+                 Question.query.order_by(Question.id).filter(Question.question.ilike('%{}%'.format(term)))]
+    return questions[:PER_PAGE], len(questions)
+
+
+def main(sizes):
+    app = make_app()
+    rows = []
+    with app.app_context():
+        for size in sizes:
+            seed(size)
+            # A word, a prefix and two words of one question.
+            words = Question.query.get(1).question.rstrip('?').split()[3:]
+            terms = [words[0], words[1][:3], ' '.join(words[2:4])]
+            backend = IndexSearch(QuestionIndex())
+            start = time.perf_counter()
+            backend.index.load()
+            build_ms = (time.perf_counter() - start) * 1000
+            for term in terms:
+                ilike_queries, ilike_ms = measure(lambda: ilike_search(term))
+                matches = backend.search(term, PER_PAGE)[1]
+                index_queries, index_ms = measure(lambda: backend.search(term, PER_PAGE))
+                rows.append((size, term, matches, ilike_queries, ilike_ms, build_ms, index_queries, index_ms))
+    report('question search', ['questions', 'term', 'matches', 'ilike queries', 'ilike ms', 'build ms', 'index queries', 'index ms'], rows)
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or SIZES)
@@ -0,0 +1,92 @@
+'''
+Benchmark for app startup.
+
+Compares the startup the test suite used to pay before every test, with
+setup_db() creating the schema in create_app(), setup_db() called again
+by setUp() and a second SQLAlchemy() instance creating it a third time,
+against the current create_app() done once per test case. Reports the
+time, the SQL statements and the new database connections of a suite of
+TESTS tests. The database is a SQLite file.
+
+    python -m benchmarks.bench_startup
+'''
+import os
+import tempfile
+import time
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+from fsnd_common.bench import report
+from fsnd_common.sqltrace import track_queries
+from benchmarks.common import seed
+from models import db, create_schema
+from flaskr import create_app
+from flaskr.categories import category_cache
+
+TESTS = 20
+
+
+def legacy_setup_db(app, database_uri):
+    # setup_db() as it was: binds the app and creates the schema.
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.app = app
+    db.init_app(app)
+    db.create_all()
+
+
+def legacy_setup(database_uri):
+    # One setUp() of the old test case.
+    app = Flask(__name__)
+    legacy_setup_db(app, database_uri)
+    with app.app_context():
+        category_cache.invalidate()
+        category_cache.load()
+    legacy_setup_db(app, database_uri)
+    with app.app_context():
+        other = SQLAlchemy()
+        other.init_app(app)
+        other.create_all()
+    db.app = None
+    return app
+
+
+def run(fn):
+    connections = {'count': 0}
+
+    def connect(*args):
+        connections['count'] += 1
+
+    event.listen(Pool, 'connect', connect)
+    try:
+        with track_queries() as stats:
+            start = time.perf_counter()
+            fn()
+            elapsed = (time.perf_counter() - start) * 1000
+    finally:
+        event.remove(Pool, 'connect', connect)
+    return elapsed, stats.count, connections['count']
+
+
+def main():
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    uri = 'sqlite:///' + path
+    try:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': uri})
+        with app.app_context():
+            create_schema()
+            seed(1000)
+            db.engine.dispose()
+        legacy = run(lambda: [legacy_setup(uri) for _ in range(TESTS)])
+        current = run(lambda: create_app({'SQLALCHEMY_DATABASE_URI': uri}))
+    finally:
+        os.remove(path)
+    report('startup of a {} test suite'.format(TESTS), ['setup', 'ms', 'statements', 'connections'], [
+        ('per test (old)',) + legacy,
+        ('once (current)',) + current,
+    ])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+'''
+Shared helpers for the Trivia benchmarks.
+
+The benchmarks run the real models and endpoint helpers against a
+throwaway SQLite database by default, so they need neither the Postgres
+database from models.py nor any data of their own. Run them from the
+backend directory:
+
+    python -m benchmarks.<name>
+'''
+import random
+import time
+from flask import Flask
+from fsnd_common.sqltrace import track_queries
+from models import db, Question, Category, create_schema
+from flaskr.categories import category_cache
+from flaskr.questions import question_counts
+from flaskr.quiz import question_ids
+from flaskr.search import question_index
+
+CATEGORIES = ['Science', 'Art', 'Geography', 'History', 'Entertainment', 'Sports']
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'ze', 'po', 'den', 'mar', 'tis', 'gol', 'bra']
+
+
+def vocabulary(size, rnd):
+    # Made-up words of two to four syllables, so searches match a few
+    # questions each rather than all of them.
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4))))
+    return sorted(words)
+
+
+def make_app(database_uri='sqlite://'):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed(num_questions, seed=0, batch=50000):
+    '''
+    seed(num_questions)
+        fills an empty database with the six categories and questions
+        spread evenly over them, worded from a vocabulary of 5000 words.
+    '''
+    rnd = random.Random(seed)
+    words = vocabulary(5000, rnd)
+    db.drop_all()
+    create_schema()
+    db.session.execute(Category.__table__.insert(), [
+        {'id': i + 1, 'type': type} for i, type in enumerate(CATEGORIES)])
+    for start in range(0, num_questions, batch):
+        db.session.execute(Question.__table__.insert(), [{
+            'id': i + 1,
+            'question': 'What is the {}?'.format(' '.join(rnd.sample(words, 6))),
+            'answer': ' '.join(rnd.sample(words, 2)),
+            'category': str(i % len(CATEGORIES) + 1),
+            'difficulty': rnd.randint(1, 5),
+        } for i in range(start, min(start + batch, num_questions))])
+    db.session.commit()
+    reset_caches()
+
+
+def reset_caches():
+    # The process-wide caches of flaskr, after writes that bypassed the
+    # model methods.
+    category_cache.invalidate()
+    question_counts.invalidate()
+    question_ids.invalidate()
+    question_index.reset()
+
+
+def measure(fn, repeat=3):
+    '''
+    measure(fn)
+        runs fn `repeat` times with a clean session and returns
+        (queries per call, best wall time in milliseconds).
+    '''
+    best = None
+    for _ in range(repeat):
+        db.session.expunge_all()
+        with track_queries() as stats:
+            start = time.perf_counter()
+            fn()
+            elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return stats.count, best
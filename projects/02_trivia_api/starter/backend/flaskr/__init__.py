@@ -3,16 +3,49 @@ from flask import Flask, request, abort, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 import random
-from sqlalchemy import func
+import click
+from sqlalchemy.exc import SQLAlchemyError
+from fsnd_common.sqltrace import SQLTrace
 
-from models import setup_db, Question, Category,database_path
+from models import setup_db, create_schema, Question, Category,database_path
+from .questions import list_questions
+from .search import make_backend, parse_cursor, words
+from .quiz import next_question
+from .quiz_sessions import QuizSessions, DECK_SIZE
+from .categories import category_cache
+from .conditional import table_versions, unchanged_since
+from .bulk import create_questions, delete_questions, MAX_ITEMS
 
 QUESTIONS_PER_PAGE = 10
 
 def create_app(test_config=None):
   # create and configure the app
   app = Flask(__name__)
+  if test_config is not None:
+    app.config.from_mapping(test_config)
   setup_db(app)
+  SQLTrace(app)
+  # The category map is served from memory from the first request on.
+  with app.app_context():
+    category_cache.invalidate()
+    try:
+      category_cache.load()
+    except SQLAlchemyError as error:
+      # No schema yet (e.g. before `flask init-db`): loaded on first use.
+      app.logger.warning('categories not loaded at startup: %s', str(error).splitlines()[0])
+    # SEARCH_BACKEND 'fulltext' or 'index'; by default the one suited to the database
+    search_backend = make_backend(app.config.get('SEARCH_BACKEND'))
+  # VERSION_STORE: a shared fsnd_common.conditional.VersionStore when several
+  # processes serve the API
+  if app.config.get('VERSION_STORE') is not None:
+    table_versions.store = app.config['VERSION_STORE']
+
+  @app.cli.command('init-db')
+  def init_db():
+    '''Create the tables and apply migrations/ on Postgres.'''
+    create_schema()
+    click.echo('Database schema created.')
+
   '''
   DONE: Set up CORS. Allow '*' for origins. Delete the sample route after completing the TODOs
   '''
@@ -33,14 +66,14 @@ def create_app(test_config=None):
   for all available categories.
   '''
   @app.route('/categories')
+  @unchanged_since('categories')
   def get_categories():
-    categories={category.id:category.type for category in Category.query.order_by(Category.id).all()};
-    return jsonify({'categories':categories})
+    return jsonify({'categories':category_cache.categories()})
+
+  def page_args():
+    # ?page=<n> or, for keyset paging, ?after=<id of the last question seen>
+    return request.args.get('page',1,type=int), request.args.get('after',type=int)
 
-  def pagination(questions,page):
-    start = (int(page)-1) * QUESTIONS_PER_PAGE
-    end = start + QUESTIONS_PER_PAGE
-    return questions[start:end]
   '''
   DONE 
   Create an endpoint to handle GET requests for questions, 
@@ -55,15 +88,14 @@ def create_app(test_config=None):
   '''
   
   @app.route('/questions')
+  @unchanged_since('questions', 'categories')
   def get_questions():
-    page = request.args.get('page',1,type=int)
-    questions = [question.format() for question in Question.query.order_by(Question.id).all()]
-    paginated_questions=pagination(questions,page)
-    categories={category.id:category.type for category in Category.query.order_by(Category.id).all()}
+    page, after = page_args()
+    paginated_questions, total_questions, next_after = list_questions(QUESTIONS_PER_PAGE, page, after)
     if (len(paginated_questions)==0):
       abort(404)
-    else:
-      return jsonify({'success':True, 'questions':paginated_questions,'total_questions':len(questions),'current_category':'ALL','categories':categories})
+    categories=category_cache.categories()
+    return jsonify({'success':True, 'questions':paginated_questions,'total_questions':total_questions,'next_after':next_after,'current_category':'ALL','categories':categories})
       
   '''
   DONE 
@@ -97,16 +129,24 @@ def create_app(test_config=None):
     body=request.get_json()
     search_term=body.get('searchTerm')
     if search_term!=None:
-      questions=[
-        question.format() for question in
-        Question.query.order_by(Question.id).filter(Question.question.ilike('%{}%'.format(search_term)))
-      ]
-      page=request.args.get('page',1,type=int)
-      paginated_questions=pagination(questions,page)
+      if words(search_term):
+        # ?page=<n> or ?after=<next_after of the previous page>
+        page=request.args.get('page',1,type=int)
+        after=request.args.get('after')
+        try:
+          after=parse_cursor(after) if after is not None else None
+        except ValueError:
+          abort(422)
+        paginated_questions, total_questions, next_after = search_backend.search(search_term, QUESTIONS_PER_PAGE, page, after)
+      else:
+        # An empty search lists every question.
+        page, after = page_args()
+        paginated_questions, total_questions, next_after = list_questions(QUESTIONS_PER_PAGE, page, after)
       return jsonify({
         'success':True,
         'questions': paginated_questions,
-        'total_questions' : len(questions)
+        'total_questions' : total_questions,
+        'next_after': next_after
       })
     else:
       question_text=body.get('question')
@@ -122,6 +162,43 @@ def create_app(test_config=None):
         'id_question' :question.id
         })
   '''
+  Bulk endpoints for question packs: every item is validated, the valid
+  ones are written in one transaction, and the response has one result
+  per item.
+  '''
+  def bulk_items(key):
+    body = request.get_json(silent=True) or {}
+    items = body.get(key)
+    if not isinstance(items, list) or not items:
+      abort(422)
+    if len(items) > MAX_ITEMS:
+      abort(413)
+    return items
+
+  @app.route('/questions/bulk', methods=['POST'])
+  def create_questions_bulk():
+    results = create_questions(bulk_items('questions'))
+    return jsonify({
+      'success': True,
+      'created': sum(1 for result in results if result['success']),
+      'results': results
+    })
+
+  @app.route('/questions/bulk', methods=['DELETE'])
+  def delete_questions_bulk():
+    ids = bulk_items('ids')
+    # JSON true/false would pass for the ids 1 and 0; a repeated id would be
+    # reported deleted once per repetition
+    if not all(type(id) is int for id in ids) or len(set(ids)) != len(ids):
+      abort(422)
+    results = delete_questions(ids)
+    return jsonify({
+      'success': True,
+      'deleted': sum(1 for result in results if result['success']),
+      'results': results
+    })
+
+  '''
   DONE 
   Create a POST endpoint to get questions based on a search term. 
   It should return any questions for whom the search term 
@@ -140,24 +217,21 @@ def create_app(test_config=None):
   category to be shown. 
   '''
   @app.route('/categories/<int:id_category>/questions')
+  @unchanged_since('questions', 'categories')
   def get_questions_by_category(id_category):
     
-    category=Category.query.filter(Category.id==id_category).one_or_none()
-    if category==None:
+    categories=category_cache.categories()
+    if id_category not in categories:
       abort(404)
-    questions= [
-      question.format() for question in 
-      Question.query.order_by(Question.id).filter(Question.category==id_category).all()
-    ]
-    page=request.args.get('page',1,type=int)
-    paginated_questions=pagination(questions,page)
-    categories={category.id:category.type for category in Category.query.order_by(Category.id).all()}
+    page, after = page_args()
+    paginated_questions, total_questions, next_after = list_questions(QUESTIONS_PER_PAGE, page, after, id_category)
     return jsonify({
             'success': True,
             'questions': paginated_questions,
-            'total_questions': len(questions),
+            'total_questions': total_questions,
+            'next_after': next_after,
             'categories': categories,
-            'current_category': category.type
+            'current_category': categories[id_category]
         })
 
 
@@ -177,10 +251,10 @@ def create_app(test_config=None):
         body = request.get_json()
         previous_questions = body.get('previous_questions')
         category = body.get('quiz_category')
-        if category['id'] == 0:
-            question = Question.query.filter(Question.id.notin_(previous_questions)).order_by(func.random()).first()
-        else:
-            question = Question.query.filter(Question.id.notin_(previous_questions), Question.category == category['id']).order_by(func.random()).first()
+        try:
+            question = next_question(int(category['id']), previous_questions)
+        except (KeyError, TypeError, ValueError):
+            abort(422)
 
         if question == None:
           abort(404)
@@ -190,6 +264,49 @@ def create_app(test_config=None):
             'question': question.format(),
         })     
 
+  '''
+  Quiz sessions: an alternative to /quizzes that keeps the previous
+  questions on the server. Start a session for a category, then ask for
+  the next question of its shuffled deck until "question" is null.
+  QUIZ_SESSION_STORE in test_config replaces the in-memory store, e.g.
+  with a shared one.
+  '''
+  quiz_sessions = QuizSessions(app.config.get('QUIZ_SESSION_STORE'))
+
+  @app.route('/quizzes/sessions', methods=['POST'])
+  def start_quiz_session():
+    body = request.get_json() or {}
+    try:
+      started = quiz_sessions.start(int(body['quiz_category']['id']), int(body.get('deck_size', DECK_SIZE)))
+    except (KeyError, TypeError, ValueError):
+      abort(422)
+    if started == None:
+      abort(404)
+    session_id, total_questions = started
+    return jsonify({
+      'success': True,
+      'session_id': session_id,
+      'total_questions': total_questions
+    })
+
+  @app.route('/quizzes/sessions/<session_id>/next', methods=['POST'])
+  def next_quiz_question(session_id):
+    try:
+      question, remaining = quiz_sessions.next_question(session_id)
+    except KeyError:
+      abort(404)
+    return jsonify({
+      'success': True,
+      'question': question.format() if question != None else None,
+      'remaining_questions': remaining
+    })
+
+  @app.route('/quizzes/sessions/<session_id>', methods=['DELETE'])
+  def end_quiz_session(session_id):
+    if not quiz_sessions.end(session_id):
+      abort(404)
+    return jsonify({'success': True, 'deleted': session_id})
+
   '''
   DONE 
   Create error handlers for all expected errors 
@@ -202,6 +319,13 @@ def create_app(test_config=None):
       "error": 404,
       "message": "Resource not found"
       }), 404
+  @app.errorhandler(413)
+  def too_large(error):
+    return jsonify({
+      "success": False,
+      "error": 413,
+      "message": "too many items, at most {}".format(MAX_ITEMS)
+      }), 413
   @app.errorhandler(422)
   def not_found(error):
     return jsonify({
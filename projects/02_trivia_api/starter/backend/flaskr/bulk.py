@@ -0,0 +1,73 @@
+from models import Question
+from .categories import category_cache
+
+'''
+Bulk question writes
+
+POST /questions/bulk and DELETE /questions/bulk load or remove question
+packs in one request and one transaction. The categories are checked once
+against the cached category map, every item gets a result of its own, and
+the valid items are written with batched statements (Question.insert_many
+and Question.delete_many).
+'''
+
+# Items accepted by one request.
+MAX_ITEMS = 10000
+
+def validate(item, categories):
+  '''
+  validate(item, categories)
+      (Question, None) for a valid question item, or (None, error).
+  '''
+  if not isinstance(item, dict):
+    return None, 'not a question object'
+  for field in ('question', 'answer'):
+    if not isinstance(item.get(field), str) or not item[field].strip():
+      return None, '{} is required'.format(field)
+  try:
+    category = int(item.get('category'))
+    difficulty = int(item.get('difficulty'))
+  except (TypeError, ValueError):
+    return None, 'category and difficulty must be numbers'
+  if category not in categories:
+    return None, 'category {} does not exist'.format(category)
+  return Question(question=item['question'], answer=item['answer'], category=category, difficulty=difficulty), None
+
+
+def create_questions(items):
+  '''
+  create_questions(items)
+      inserts the valid items and returns one result per item, in order:
+      {'index', 'success', 'id'} or {'index', 'success', 'error'}.
+  '''
+  categories = category_cache.categories()
+  results = []
+  questions = []
+  for index, item in enumerate(items):
+    question, error = validate(item, categories)
+    if error is not None:
+      results.append({'index': index, 'success': False, 'error': error})
+    else:
+      results.append({'index': index, 'success': True})
+      questions.append((index, question))
+  if questions:
+    Question.insert_many([question for index, question in questions])
+    for index, question in questions:
+      results[index]['id'] = question.id
+  return results
+
+
+def delete_questions(ids):
+  '''
+  delete_questions(ids)
+      deletes the existing questions of `ids`, distinct integers, and
+      returns one result per id: {'id', 'success'} plus an error for ids
+      that were not found.
+  '''
+  found = {question.id: question for question in Question.query.filter(Question.id.in_(ids))} if ids else {}
+  if found:
+    Question.delete_many(list(found.values()))
+  return [
+    {'id': id, 'success': True} if id in found else {'id': id, 'success': False, 'error': 'not found'}
+    for id in ids
+  ]
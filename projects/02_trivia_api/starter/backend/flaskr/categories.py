@@ -0,0 +1,63 @@
+import threading
+import time
+
+from models import db, Category, on_change
+
+'''
+Category map
+
+Every listing endpoint sends the {id: type} map of the categories, which
+almost never changes. It is read once into a process-wide cache, reloaded
+after category writes through the model methods. /categories is also
+served with an ETag (see conditional.py), so clients can revalidate it
+instead of downloading it again.
+'''
+
+class CategoryCache:
+  '''
+  CategoryCache(ttl)
+      the {id: type} map of the categories. invalidate()
+      bumps a version number; a load that was running when the version
+      moved does not store its (possibly stale) result. The ttl bounds how
+      long category writes made by another process go unnoticed.
+  '''
+  def __init__(self, ttl=300):
+    self.ttl = ttl
+    self.version = 0
+    self.entry = None
+    self.loaded_at = 0
+    self.lock = threading.Lock()
+
+  def load(self):
+    with self.lock:
+      version = self.version
+    categories = {category.id: category.type for category in Category.query.order_by(Category.id).all()}
+    with self.lock:
+      if self.version == version:
+        self.entry = categories
+        self.loaded_at = time.time()
+    return categories
+
+  def categories(self):
+    '''
+    categories()
+        the {id: type} map, from memory unless a write or the ttl made the
+        cached map stale.
+    '''
+    entry = self.entry
+    if entry is None or time.time() - self.loaded_at > self.ttl:
+      return self.load()
+    return entry
+
+  def invalidate(self):
+    with self.lock:
+      self.version += 1
+      self.entry = None
+
+
+category_cache = CategoryCache()
+
+@on_change
+def categories_changed(model, action, instances):
+  if model is Category:
+    category_cache.invalidate()
@@ -0,0 +1,24 @@
+from fsnd_common.conditional import TableVersions, conditional
+
+from models import on_change
+
+'''
+Conditional GET
+
+The change counters of the questions and categories tables, bumped after
+every write through the model methods. The read endpoints send an ETag
+derived from them and answer a matching If-None-Match with 304 before
+running any query.
+'''
+
+table_versions = TableVersions()
+
+@on_change
+def bump_version(model, action, instances):
+  table_versions.bump(model.__tablename__)
+
+# Trivia data is public: any cache may keep it, but must revalidate it.
+CACHE_CONTROL = 'public, no-cache'
+
+def unchanged_since(*tables):
+  return conditional(table_versions, *tables, cache_control=CACHE_CONTROL)
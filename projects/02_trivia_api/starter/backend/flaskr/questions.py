@@ -0,0 +1,90 @@
+import threading
+import time
+from sqlalchemy import func
+
+from models import db, Question, on_change
+
+'''
+Question listings
+
+The /questions and /categories/<id>/questions endpoints read one page of
+questions with LIMIT/OFFSET, or with a keyset on Question.id when the
+client passes ?after=<last id seen>, so the cost of a page does not grow
+with the question bank. Totals come from a cached per-category count.
+Searches are in search.py.
+'''
+
+class QuestionCounts:
+  '''
+  QuestionCounts(ttl)
+      number of questions per category, loaded with one GROUP BY query and
+      dropped whenever a question is inserted, updated or deleted through
+      the model methods. The ttl bounds how stale the counts of another
+      process's writes can get.
+  '''
+  def __init__(self, ttl=60):
+    self.ttl = ttl
+    self.counts = None
+    self.loaded_at = 0
+    self.lock = threading.Lock()
+
+  def load(self):
+    with self.lock:
+      if self.counts is None or time.time() - self.loaded_at > self.ttl:
+        rows = db.session.query(Question.category, func.count(Question.id)).group_by(Question.category).all()
+        self.counts = {int(category): count for category, count in rows if category is not None}
+        self.loaded_at = time.time()
+      return self.counts
+
+  def total(self, category=None):
+    counts = self.load()
+    if category is None:
+      return sum(counts.values())
+    return counts.get(int(category), 0)
+
+  def invalidate(self):
+    with self.lock:
+      self.counts = None
+
+
+question_counts = QuestionCounts()
+
+@on_change
+def questions_changed(model, action, instances):
+  if model is Question:
+    question_counts.invalidate()
+
+
+def page_of(query, per_page, page=1, after=None):
+  '''
+  page_of(query, per_page, page, after)
+      one page of a Question query ordered by id: the questions after id
+      `after` when it is given, else page number `page`. Returns the
+      formatted questions and the `after` value of the next page (None on
+      the last page).
+  '''
+  query = query.order_by(Question.id)
+  if after is not None:
+    query = query.filter(Question.id > after)
+  else:
+    query = query.offset((max(page, 1) - 1) * per_page)
+  # One extra row tells whether there is a next page.
+  questions = query.limit(per_page + 1).all()
+  next_after = None
+  if len(questions) > per_page:
+    questions = questions[:per_page]
+    next_after = questions[-1].id
+  return [question.format() for question in questions], next_after
+
+
+def list_questions(per_page, page=1, after=None, category=None):
+  '''
+  list_questions(per_page, page, after, category)
+      a page of all questions, or of one category's, with their total.
+  '''
+  query = Question.query
+  if category is not None:
+    query = query.filter(Question.category == category)
+  questions, next_after = page_of(query, per_page, page, after)
+  return questions, question_counts.total(category), next_after
+
@@ -0,0 +1,93 @@
+import random
+import threading
+from array import array
+
+from models import db, Question, on_change
+
+'''
+Quiz questions
+
+/quizzes needs a random question of a category that is not among the
+previous questions of the game. Instead of sorting the category with
+ORDER BY random() on every call, the ids of each category are kept in
+memory and an unseen one is drawn at random, so a question costs one
+primary key lookup whatever the size of the bank and of the game.
+'''
+
+# Random draws tried before falling back to listing the unseen ids; only
+# games that have seen most of their category get that far.
+MAX_DRAWS = 8
+
+class QuestionIds:
+  '''
+  QuestionIds()
+      the question ids of every category as compact integer arrays,
+      loaded with one query on first use and dropped whenever a question
+      is inserted, updated or deleted through the model methods. Category
+      0 holds every id.
+  '''
+  def __init__(self):
+    self.ids = None
+    self.lock = threading.Lock()
+
+  def load(self):
+    with self.lock:
+      if self.ids is None:
+        ids = {0: array('l')}
+        # A Core select: the rows are plain tuples, no ORM overhead per id.
+        rows = db.session.execute(db.select([Question.id, Question.category]).order_by(Question.id))
+        for id, category in rows:
+          ids[0].append(id)
+          if category is not None:
+            ids.setdefault(int(category), array('l')).append(id)
+        self.ids = ids
+      return self.ids
+
+  def of(self, category):
+    return self.load().get(category, ())
+
+  def invalidate(self):
+    with self.lock:
+      self.ids = None
+
+
+question_ids = QuestionIds()
+
+@on_change
+def questions_changed(model, action, instances):
+  if model is Question:
+    question_ids.invalidate()
+
+
+def draw(ids, previous):
+  '''
+  draw(ids, previous)
+      a random id of `ids` that is not in the set `previous`, or None if
+      every id has been seen.
+  '''
+  if len(previous) < len(ids):
+    for _ in range(MAX_DRAWS):
+      id = ids[random.randrange(len(ids))]
+      if id not in previous:
+        return id
+  unseen = [id for id in ids if id not in previous]
+  return random.choice(unseen) if unseen else None
+
+
+def next_question(category, previous_questions):
+  '''
+  next_question(category, previous_questions)
+      a random Question of `category` (0 for all of them) whose id is not
+      in previous_questions, or None when there is none left.
+  '''
+  previous = set(previous_questions or [])
+  while True:
+    id = draw(question_ids.of(int(category)), previous)
+    if id is None:
+      return None
+    question = Question.query.get(id)
+    if question is not None:
+      return question
+    # Deleted by another process since the ids were loaded.
+    question_ids.invalidate()
+    previous.add(id)
@@ -0,0 +1,124 @@
+import random
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from models import Question
+from .quiz import question_ids
+
+'''
+Quiz sessions
+
+An alternative to sending the whole previous_questions list with every
+/quizzes request: a session draws a shuffled deck of question ids for its
+category once, keeps it in a session store, and hands the questions out
+in order. Every "next question" is a store read and one primary key
+lookup, and the client only sends the session id.
+'''
+
+DECK_SIZE = 50
+
+class SessionStore:
+  '''
+  SessionStore
+      where the decks live. The default LRUSessionStore keeps them in
+      process; a shared store (e.g. a redis client wrapper) implements the
+      same methods so every app process can serve every session. Values
+      are plain dicts of JSON types.
+  '''
+  def get(self, key):
+    raise NotImplementedError
+
+  def set(self, key, value):
+    raise NotImplementedError
+
+  def delete(self, key):
+    raise NotImplementedError
+
+
+class LRUSessionStore(SessionStore):
+  '''
+  LRUSessionStore(maxsize, ttl)
+      at most `maxsize` sessions, the least recently used dropped first,
+      each one expiring `ttl` seconds after its last use.
+  '''
+  def __init__(self, maxsize=10000, ttl=3600):
+    self.maxsize = maxsize
+    self.ttl = ttl
+    self.entries = OrderedDict()
+    self.lock = threading.Lock()
+
+  def get(self, key):
+    with self.lock:
+      entry = self.entries.get(key)
+      if entry is None:
+        return None
+      value, expires = entry
+      if expires <= time.time():
+        del self.entries[key]
+        return None
+      self.entries.move_to_end(key)
+      return value
+
+  def set(self, key, value):
+    with self.lock:
+      self.entries[key] = (value, time.time() + self.ttl)
+      self.entries.move_to_end(key)
+      while len(self.entries) > self.maxsize:
+        self.entries.popitem(last=False)
+
+  def delete(self, key):
+    with self.lock:
+      return self.entries.pop(key, None) is not None
+
+  def __len__(self):
+    return len(self.entries)
+
+
+class QuizSessions:
+  '''
+  QuizSessions(store)
+      start(category, deck_size) creates a session and returns its id and
+      the number of questions in its deck, next_question(session_id)
+      returns the next Question of the deck.
+  '''
+  def __init__(self, store=None):
+    self.store = store if store is not None else LRUSessionStore()
+
+  def start(self, category, deck_size=DECK_SIZE):
+    '''
+    start(category, deck_size)
+        (session id, deck size) of a new session over up to deck_size
+        random questions of `category` (0 for all of them), or None if the
+        category has no questions.
+    '''
+    ids = question_ids.of(int(category))
+    if not ids:
+      return None
+    deck = random.sample(ids, min(max(deck_size, 1), len(ids)))
+    session_id = secrets.token_urlsafe(16)
+    self.store.set(session_id, {'category': int(category), 'deck': deck, 'position': 0})
+    return session_id, len(deck)
+
+  def next_question(self, session_id):
+    '''
+    next_question(session_id)
+        (question, questions left) for the session: question is None once
+        the deck is used up. Raises KeyError for an unknown or expired
+        session.
+    '''
+    session = self.store.get(session_id)
+    if session is None:
+      raise KeyError(session_id)
+    deck = session['deck']
+    question = None
+    while question is None and session['position'] < len(deck):
+      # Skips questions deleted since the deck was drawn.
+      question = Question.query.get(deck[session['position']])
+      session['position'] += 1
+    self.store.set(session_id, session)
+    return question, len(deck) - session['position']
+
+  def end(self, session_id):
+    return self.store.delete(session_id)
@@ -0,0 +1,241 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+from sqlalchemy import Float, and_, cast, func, literal_column, or_
+
+from models import db, Question, on_change
+
+'''
+Question search
+
+Full-text search over the question and answer text. Every word of the
+search term must match the start of a word of the question (e.g. "tit"
+finds "title"); results are ranked by relevance, matches in the question
+weighing more than matches in the answer. Two interchangeable backends
+return the same shape of results:
+
+  FullTextSearch   - Postgres; to_tsquery() against the search_vector
+                     column and its GIN index from
+                     migrations/0001_question_search.sql, ranked with
+                     ts_rank_cd(). Words are stemmed and stop words ignored.
+  IndexSearch      - in process; an inverted index from every word to the
+                     questions containing it, for SQLite and tests. It is
+                     built from the database on first use and kept up to
+                     date by Question.insert()/update()/delete().
+
+Both look up the words of the term in an index, so the cost of a search
+depends on the number of matches, not on the number of questions.
+
+Like the listings, results are paged by number or with a keyset: every
+page comes with a cursor '<rank>:<id>' of its last question, and passing
+it back as `after` continues right after that question in the ranking.
+'''
+
+# The ts_rank_cd weights of the question ('A') and answer ('B') text.
+QUESTION_WEIGHT = 1.0
+ANSWER_WEIGHT = 0.4
+
+def words(text):
+  return re.findall(r'\w+', (text or '').lower())
+
+def cursor(rank, id):
+  # repr() of a double keeps every digit, so the rank compares equal once
+  # parsed back; the backends rank in double precision for this reason
+  return '{!r}:{}'.format(float(rank), id)
+
+def parse_cursor(value):
+  '''
+  parse_cursor(value)
+      the (rank, id) of a cursor returned as `next_after`; ValueError if
+      it isn't one.
+  '''
+  rank, _, id = (value or '').partition(':')
+  rank, id = float(rank), int(id)
+  if not math.isfinite(rank):
+    raise ValueError('invalid cursor: {!r}'.format(value))
+  return rank, id
+
+
+class SearchBackend:
+  '''
+  SearchBackend
+      search(term, per_page, page, after) returns a page of formatted
+      questions, best match first, the total number of matches and the
+      cursor of the next page (None on the last page). after is the
+      parsed (rank, id) cursor of the last question seen, used instead of
+      page.
+  '''
+  def search(self, term, per_page, page=1, after=None):
+    raise NotImplementedError
+
+
+class FullTextSearch(SearchBackend):
+
+  def search(self, term, per_page, page=1, after=None):
+    terms = words(term)
+    if not terms:
+      return [], 0, None
+    # 'tit & spac' -> 'tit:* & spac:*', every word a prefix
+    query = func.to_tsquery('english', ' & '.join(word + ':*' for word in terms))
+    vector = literal_column('questions.search_vector')
+    # ts_rank_cd() is a real: compared with the float8 of a cursor it
+    # would be widened to a value the cursor never held, and ties missed.
+    rank = cast(func.ts_rank_cd(vector, query), Float(53))
+    rows = db.session.query(
+      Question,
+      rank.label('rank'),
+      func.count().over().label('total')
+    ).filter(
+      vector.op('@@')(query)
+    ).order_by(
+      rank.desc(), Question.id
+    )
+    if after is not None:
+      rows = rows.filter(or_(rank < after[0], and_(rank == after[0], Question.id > after[1])))
+    else:
+      rows = rows.offset((max(page, 1) - 1) * per_page)
+    # One extra row tells whether there is a next page.
+    rows = rows.limit(per_page + 1).all()
+    if not rows:
+      return [], self.total(vector, query) if after is not None or page > 1 else 0, None
+    # With a keyset the window only counts the matches after `after`.
+    total = rows[0].total if after is None else self.total(vector, query)
+    next_after = None
+    if len(rows) > per_page:
+      rows = rows[:per_page]
+      next_after = cursor(rows[-1].rank, rows[-1][0].id)
+    return [row[0].format() for row in rows], total, next_after
+
+  def total(self, vector, query):
+    # Past the last match the window count has no row to ride on.
+    return db.session.query(func.count(Question.id)).filter(vector.op('@@')(query)).scalar()
+
+
+class QuestionIndex:
+  '''
+  QuestionIndex()
+      postings {word: {question id: weight}} of the question and answer
+      text, and the sorted vocabulary, where the words starting with a
+      prefix are a contiguous range found by bisection.
+  '''
+  def __init__(self):
+    self.lock = threading.RLock()
+    self.reset()
+
+  def reset(self):
+    with self.lock:
+      self.loaded = False
+      self.postings = {}
+      self.vocabulary = []
+      self.documents = {}
+
+  def load(self):
+    with self.lock:
+      if not self.loaded:
+        for id, question, answer in db.session.query(Question.id, Question.question, Question.answer):
+          self.add(id, question, answer)
+        self.loaded = True
+
+  def add(self, id, question, answer):
+    weights = {}
+    for word in words(answer):
+      weights[word] = ANSWER_WEIGHT
+    for word in words(question):
+      weights[word] = QUESTION_WEIGHT
+    with self.lock:
+      self.remove(id)
+      self.documents[id] = list(weights)
+      for word, weight in weights.items():
+        if word not in self.postings:
+          self.postings[word] = {}
+          bisect.insort(self.vocabulary, word)
+        self.postings[word][id] = weight
+
+  def remove(self, id):
+    with self.lock:
+      for word in self.documents.pop(id, ()):
+        ids = self.postings[word]
+        del ids[id]
+        if not ids:
+          del self.postings[word]
+          del self.vocabulary[bisect.bisect_left(self.vocabulary, word)]
+
+  def prefixed(self, prefix):
+    # {id: weight} of the questions with a word starting with `prefix`.
+    start = bisect.bisect_left(self.vocabulary, prefix)
+    matches = {}
+    for word in self.vocabulary[start:]:
+      if not word.startswith(prefix):
+        break
+      for id, weight in self.postings[word].items():
+        if weight > matches.get(id, 0):
+          matches[id] = weight
+    return matches
+
+  def search(self, terms):
+    '''
+    search(terms)
+        {id: score} of the questions matching every word of `terms`.
+    '''
+    with self.lock:
+      self.load()
+      postings = sorted((self.prefixed(term) for term in terms), key=len)
+    if not postings:
+      return {}
+    scores = dict(postings[0])
+    for matches in postings[1:]:
+      scores = {id: score + matches[id] for id, score in scores.items() if id in matches}
+    return scores
+
+
+question_index = QuestionIndex()
+
+@on_change
+def questions_changed(model, action, instances):
+  # Only maintained once loaded; the first search reads the database.
+  if model is not Question or not question_index.loaded:
+    return
+  for question in instances:
+    if action == 'delete':
+      question_index.remove(question.id)
+    else:
+      question_index.add(question.id, question.question, question.answer)
+
+
+class IndexSearch(SearchBackend):
+
+  def __init__(self, index=question_index):
+    self.index = index
+
+  def search(self, term, per_page, page=1, after=None):
+    scores = self.index.search(words(term))
+    key = lambda id: (-scores[id], id)
+    if after is not None:
+      start = (-after[0], after[1])
+      candidates = [id for id in scores if key(id) > start]
+      ranked = heapq.nsmallest(per_page + 1, candidates, key=key)
+    else:
+      start = (max(page, 1) - 1) * per_page
+      ranked = heapq.nsmallest(start + per_page + 1, scores, key=key)[start:]
+    ids = ranked[:per_page]
+    next_after = cursor(scores[ids[-1]], ids[-1]) if len(ranked) > per_page else None
+    questions = {question.id: question for question in Question.query.filter(Question.id.in_(ids))} if ids else {}
+    return [questions[id].format() for id in ids if id in questions], len(scores), next_after
+
+
+BACKENDS = {
+  'fulltext': FullTextSearch,
+  'index': IndexSearch,
+}
+
+def make_backend(name=None):
+  '''
+  make_backend(name)
+      the search backend called `name`, or the one suited to the database
+      of the app when name is None.
+  '''
+  if name is None:
+    name = 'fulltext' if db.engine.dialect.name == 'postgresql' else 'index'
+  return BACKENDS[name]()
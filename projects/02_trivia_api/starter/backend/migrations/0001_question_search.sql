@@ -0,0 +1,15 @@
+-- Full-text search over the question and answer text (flaskr/search.py).
+--
+-- search_vector is kept up to date by Postgres (generated column, Postgres
+-- 12 or later); question words weigh 'A' and answer words 'B' in the
+-- ts_rank_cd() ranking. The GIN index serves the @@ matches.
+--
+--   psql trivia < migrations/0001_question_search.sql
+
+ALTER TABLE questions ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(question, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(answer, '')), 'B')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS ix_questions_search_vector ON questions USING gin (search_vector);
@@ -1,27 +1,94 @@
 import os
-from sqlalchemy import Column, String, Integer, create_engine
+import glob
+from sqlalchemy import Column, String, Integer, create_engine, text
 from flask_sqlalchemy import SQLAlchemy
 import json
 
-database_name = "trivia"
-database_path = "postgres://{}/{}".format('localhost:5432', database_name)
+database_name = os.environ.get("DB_NAME", "trivia")
+database_path = "postgres://{}:{}@{}/{}".format(
+    os.environ.get("DB_USER"), os.environ.get("DB_PASSWORD"), os.environ.get("DB_HOST", "localhost:5432"), database_name)
 
 db = SQLAlchemy()
 
+'''
+setting(config, name, default)
+    a database setting from the app config (e.g. test_config), else from
+    the environment variable of the same name, else the default
+'''
+def setting(config, name, default=None):
+    value = config.get(name, os.environ.get(name))
+    if value is None:
+        return default
+    if isinstance(default, bool) and isinstance(value, str):
+        return value.lower() in ("1", "true", "yes", "on")
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return value
+
+'''
+engine_options(config, database_uri)
+    pool settings of the engine:
+        DB_POOL_SIZE            connections kept open (5)
+        DB_MAX_OVERFLOW         extra connections under load (10)
+        DB_POOL_PRE_PING        test a connection before using it (True)
+        DB_STATEMENT_TIMEOUT    Postgres statement timeout in ms (none)
+'''
+def engine_options(config, database_uri):
+    options = {"pool_pre_ping": setting(config, "DB_POOL_PRE_PING", True)}
+    if database_uri.startswith("sqlite"):
+        # SQLite pools don't take sizes or server settings.
+        return options
+    options["pool_size"] = setting(config, "DB_POOL_SIZE", 5)
+    options["max_overflow"] = setting(config, "DB_MAX_OVERFLOW", 10)
+    timeout = setting(config, "DB_STATEMENT_TIMEOUT")
+    if timeout:
+        options["connect_args"] = {"options": "-c statement_timeout={}".format(timeout)}
+    return options
+
 '''
 setup_db(app)
-    binds a flask application and a SQLAlchemy service
+    binds a flask application and a SQLAlchemy service. The database is
+    SQLALCHEMY_DATABASE_URI of the app config, else DATABASE_URL, else
+    the trivia database of DB_USER/DB_PASSWORD. It opens no connection
+    and creates no tables: run `flask init-db` once for that.
 '''
-def setup_db(app, database_path=database_path):
-    db_name = "trivia"
-    db_user = os.environ.get("DB_USER")
-    db_password = os.environ.get("DB_PASSWORD")
-    db_path = "postgres://{}:{}@{}/{}".format(db_user, db_password,'localhost:5432', db_name)
-    app.config["SQLALCHEMY_DATABASE_URI"] = db_path
+def setup_db(app, database_uri=None):
+    if database_uri is None:
+        database_uri = app.config.get("SQLALCHEMY_DATABASE_URI") or os.environ.get("DATABASE_URL") or database_path
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_uri
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-    db.app = app
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config, database_uri))
     db.init_app(app)
+
+'''
+create_schema()
+    creates the tables and, on Postgres, applies the SQL files of
+    migrations/ in order. Behind `flask init-db`.
+'''
+def create_schema():
     db.create_all()
+    if db.engine.dialect.name == "postgresql":
+        for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations", "*.sql"))):
+            with open(path) as f:
+                db.session.execute(text(f.read()))
+        db.session.commit()
+
+'''
+on_change(listener)
+    registers listener(model, action, instances) to be called after every
+    insert, update or delete committed through the model methods, e.g. to
+    drop a cache. action is 'insert', 'update' or 'delete', instances the
+    rows written.
+'''
+change_listeners = []
+
+def on_change(listener):
+    change_listeners.append(listener)
+    return listener
+
+def changed(model, action, instances):
+    for listener in change_listeners:
+        listener(model, action, instances)
 
 '''
 Question
@@ -45,13 +112,60 @@ class Question(db.Model):
   def insert(self):
     db.session.add(self)
     db.session.commit()
+    changed(Question, 'insert', [self])
   
   def update(self):
     db.session.commit()
+    changed(Question, 'update', [self])
 
   def delete(self):
     db.session.delete(self)
     db.session.commit()
+    changed(Question, 'delete', [self])
+
+  '''
+  insert_many(questions) / delete_many(questions)
+      insert or delete many questions in one transaction with batched
+      statements, instead of one commit per question
+  '''
+  @staticmethod
+  def insert_many(questions, chunk_size=1000):
+    table = Question.__table__
+    rows = [{
+      'question': question.question,
+      'answer': question.answer,
+      'category': question.category,
+      'difficulty': question.difficulty
+    } for question in questions]
+    try:
+      if db.session.get_bind().dialect.name == 'postgresql':
+        # One multi-row INSERT ... RETURNING id per chunk; Postgres returns
+        # the ids in the order of the VALUES.
+        ids = []
+        for start in range(0, len(rows), chunk_size):
+          statement = table.insert().values(rows[start:start + chunk_size]).returning(table.c.id)
+          ids.extend(id for id, in db.session.execute(statement))
+      else:
+        ids = [db.session.execute(table.insert(), row).inserted_primary_key[0] for row in rows]
+      db.session.commit()
+    except Exception:
+      db.session.rollback()
+      raise
+    for question, id in zip(questions, ids):
+      question.id = id
+    changed(Question, 'insert', questions)
+
+  @staticmethod
+  def delete_many(questions):
+    # The ORM sends the DELETEs of a flush as one executemany.
+    try:
+      for question in questions:
+        db.session.delete(question)
+      db.session.commit()
+    except Exception:
+      db.session.rollback()
+      raise
+    changed(Question, 'delete', questions)
 
   def format(self):
     return {
@@ -75,6 +189,20 @@ class Category(db.Model):
   def __init__(self, type):
     self.type = type
 
+  def insert(self):
+    db.session.add(self)
+    db.session.commit()
+    changed(Category, 'insert', [self])
+
+  def update(self):
+    db.session.commit()
+    changed(Category, 'update', [self])
+
+  def delete(self):
+    db.session.delete(self)
+    db.session.commit()
+    changed(Category, 'delete', [self])
+
   def format(self):
     return {
       'id': self.id,
@@ -1,25 +1,37 @@
 import os
 import unittest
 import json
-from flask_sqlalchemy import SQLAlchemy
 
 from flaskr import create_app
-from models import setup_db, Question, Category
+from models import db, Question, Category
+from flaskr.categories import category_cache
+from flaskr.questions import question_counts
+from flaskr.quiz import question_ids
+from flaskr.search import question_index
+from fsnd_common.sqltrace import assert_max_queries
 
 
 
 class TriviaTestCase(unittest.TestCase):
     """This class represents the trivia test case"""
 
+    @classmethod
+    def setUpClass(cls):
+        """Create the app once for the whole test case, bound to the test database."""
+        cls.database_name = "trivia_test"
+        cls.database_user=os.environ.get("DB_USER")
+        cls.database_password = os.environ.get("DB_PASSWORD")
+        cls.database_path = "postgres://{}:{}@{}/{}".format(cls.database_user,cls.database_password,'localhost:5432', cls.database_name)
+        cls.app = create_app({'SQLALCHEMY_DATABASE_URI': cls.database_path, 'DB_POOL_SIZE': 1})
+
+    @classmethod
+    def tearDownClass(cls):
+        with cls.app.app_context():
+            db.engine.dispose()
+
     def setUp(self):
-        """Define test variables and initialize app."""
-        self.app = create_app()
+        """Define test variables."""
         self.client = self.app.test_client
-        self.database_name = "trivia_test"
-        self.database_user=os.environ.get("DB_USER")
-        self.database_password = os.environ.get("DB_PASSWORD")
-        self.database_path = "postgres://{}:{}@{}/{}".format(self.database_user,self.database_password,'localhost:5432', self.database_name)
-        setup_db(self.app, self.database_path)
 
         self.new_question ={
             'question' : 'What is the name of Son Goku\'s second son?',
@@ -34,18 +46,22 @@ class TriviaTestCase(unittest.TestCase):
             'difficulty' : 1
         }
 
-        # binds the app to the current context
-        with self.app.app_context():
-            self.db = SQLAlchemy()
-            self.db.init_app(self.app)
-            # create all tables    
-            self.db.create_all()
-        
-    
     def tearDown(self):
         """Executed after reach test"""
         pass
 
+    def warm_caches(self):
+        """Reload the in-process caches, so a query budget measures the same thing whichever tests ran before."""
+        with self.app.app_context():
+            category_cache.invalidate()
+            category_cache.load()
+            question_counts.invalidate()
+            question_counts.load()
+            question_ids.invalidate()
+            question_ids.load()
+            question_index.reset()
+            question_index.load()
+
     """
     DONE
     Write at least one test for each test for successful operation and for expected errors.
@@ -61,6 +77,18 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'],True)
         self.assertTrue(data['questions'])
     
+    #Test that keyset pagination continues right after the last question seen
+    def test_get_questions_after_id(self):
+        res=self.client().get('/questions?page=1')
+        first_page=json.loads(res.data)
+        res=self.client().get('/questions?after={}'.format(first_page['next_after']))
+        data=json.loads(res.data)
+
+        self.assertEqual(res.status_code,200)
+        self.assertEqual(data['total_questions'],first_page['total_questions'])
+        self.assertTrue(data['questions'][0]['id']>first_page['questions'][-1]['id'])
+        self.assertEqual(data['questions'],json.loads(self.client().get('/questions?page=2').data)['questions'])
+
     #Test that returns error code 404 if we can't find the page of the questions searched 
     def test_get_questions_paginated_error_404(self):
         res=self.client().get('/questions?page=1000')
@@ -112,6 +140,39 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'],False)
         self.assertEqual(data['message'],'unprocessable') 
 
+    def test_bulk_create_and_delete_questions(self):
+        res=self.client().post('/questions/bulk', json={'questions': [self.new_question, self.bad_question, self.new_question]})
+        data=json.loads(res.data)
+        self.assertEqual(res.status_code,200)
+        self.assertEqual(data['created'],2)
+        self.assertEqual([result['success'] for result in data['results']],[True,False,True])
+        self.assertEqual(data['results'][1]['error'],'category 1000 does not exist')
+
+        ids=[result['id'] for result in data['results'] if result['success']]
+        res=self.client().delete('/questions/bulk', json={'ids': ids+[100000]})
+        data=json.loads(res.data)
+        self.assertEqual(res.status_code,200)
+        self.assertEqual(data['deleted'],2)
+        self.assertEqual(data['results'][-1],{'id':100000,'success':False,'error':'not found'})
+
+    def test_bulk_delete_duplicate_ids_422(self):
+        res=self.client().delete('/questions/bulk', json={'ids': [5,5,5]})
+        data=json.loads(res.data)
+        self.assertEqual(res.status_code,422)
+        self.assertEqual(data['success'],False)
+
+    def test_bulk_delete_boolean_ids_422(self):
+        res=self.client().delete('/questions/bulk', json={'ids': [True,False]})
+        data=json.loads(res.data)
+        self.assertEqual(res.status_code,422)
+        self.assertEqual(data['success'],False)
+
+    def test_bulk_create_questions_without_items_422(self):
+        res=self.client().post('/questions/bulk', json={'questions': []})
+        data=json.loads(res.data)
+        self.assertEqual(res.status_code,422)
+        self.assertEqual(data['success'],False)
+
     def test_search_question_results_OK(self):
         res=self.client().post('/questions', json={'searchTerm': 'title'})
         data=json.loads(res.data)
@@ -126,6 +187,48 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'],True)
         self.assertEqual(len(data['questions']),0)
      
+    def test_search_question_matches_word_prefix(self):
+        res=self.client().post('/questions', json={'searchTerm': 'tit'})
+        data=json.loads(res.data)
+        self.assertEqual(res.status_code,200)
+        self.assertTrue(data['questions'])
+        self.assertTrue(all('tit' in question['question'].lower() or 'tit' in question['answer'].lower() for question in data['questions']))
+
+    def test_search_question_after_cursor(self):
+        first_page=json.loads(self.client().post('/questions?page=1', json={'searchTerm': 'wh'}).data)
+        res=self.client().post('/questions?after={}'.format(first_page['next_after']), json={'searchTerm': 'wh'})
+        data=json.loads(res.data)
+        self.assertEqual(res.status_code,200)
+        self.assertEqual(data['total_questions'],first_page['total_questions'])
+        self.assertEqual(data['questions'],json.loads(self.client().post('/questions?page=2', json={'searchTerm': 'wh'}).data)['questions'])
+
+    #Identical questions share their rank: the cursor must page through every one of them once
+    def test_search_question_after_cursor_tied_ranks(self):
+        pack=[dict(self.new_question, question='Which zyzzyva is it?') for _ in range(25)]
+        res=self.client().post('/questions/bulk', json={'questions': pack})
+        ids=[result['id'] for result in json.loads(res.data)['results']]
+        seen=[]
+        url='/questions?page=1'
+        try:
+            while url:
+                data=json.loads(self.client().post(url, json={'searchTerm': 'zyzzyva'}).data)
+                seen+=[question['id'] for question in data['questions']]
+                url='/questions?after={}'.format(data['next_after']) if data['next_after'] else None
+        finally:
+            self.client().delete('/questions/bulk', json={'ids': ids})
+        self.assertEqual(data['total_questions'],25)
+        self.assertEqual(seen,sorted(ids))
+
+    def test_search_question_bad_cursor_422(self):
+        res=self.client().post('/questions?after=title', json={'searchTerm': 'title'})
+        self.assertEqual(res.status_code,422)
+
+    def test_search_question_matches_answer(self):
+        res=self.client().post('/questions', json={'searchTerm': 'apollo'})
+        data=json.loads(res.data)
+        self.assertEqual(res.status_code,200)
+        self.assertIn('Apollo 13',[question['answer'] for question in data['questions']])
+
     def test_search_question_by_category_OK(self):
         res=self.client().get('/categories/1/questions')
         data=json.loads(res.data)
@@ -159,6 +262,129 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code,404)
         self.assertEqual(data['success'],False)
         self.assertEqual((data['message']),'Resource not found')
+
+    def test_quizzes_skips_previous_questions(self):
+        res=self.client().get('/categories/5/questions')
+        ids=[question['id'] for question in json.loads(res.data)['questions']]
+        res=self.client().post('/quizzes', json={
+            "previous_questions": ids[1:],
+            "quiz_category": {"type":"Entertainment", "id": "5" }
+        })
+        data=json.loads(res.data)
+        self.assertEqual(res.status_code,200)
+        self.assertEqual(data['question']['id'],ids[0])
+
+    def test_quiz_session_deals_each_question_once(self):
+        res=self.client().post('/quizzes/sessions', json={
+            "quiz_category": {"type":"Entertainment", "id": "5" }
+        })
+        data=json.loads(res.data)
+        self.assertEqual(res.status_code,200)
+        self.assertTrue(data['session_id'])
+
+        seen=[]
+        for _ in range(data['total_questions']):
+            res=self.client().post('/quizzes/sessions/{}/next'.format(data['session_id']))
+            question=json.loads(res.data)['question']
+            self.assertEqual(question['category'],5)
+            seen.append(question['id'])
+        self.assertEqual(len(set(seen)),len(seen))
+
+        res=self.client().post('/quizzes/sessions/{}/next'.format(data['session_id']))
+        self.assertEqual(res.status_code,200)
+        self.assertEqual(json.loads(res.data)['question'],None)
+
+    def test_quiz_session_not_found_404(self):
+        res=self.client().post('/quizzes/sessions/unknown/next')
+        data=json.loads(res.data)
+        self.assertEqual(res.status_code,404)
+        self.assertEqual(data['success'],False)
+
+    def test_quiz_session_next_query_budget(self):
+        res=self.client().post('/quizzes/sessions', json={
+            "quiz_category": {"type":"Entertainment", "id": "5" }
+        })
+        session_id=json.loads(res.data)['session_id']
+        with assert_max_queries(1):
+            res=self.client().post('/quizzes/sessions/{}/next'.format(session_id))
+        self.assertEqual(res.status_code,200)
+
+    def test_get_categories_not_modified(self):
+        res=self.client().get('/categories')
+        self.assertEqual(res.status_code,200)
+        etag=res.headers['ETag']
+        res=self.client().get('/categories', headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code,304)
+        self.assertEqual(res.headers['ETag'],etag)
+
+    def test_get_questions_not_modified_without_queries(self):
+        res=self.client().get('/questions?page=1')
+        self.assertEqual(res.headers['Cache-Control'],'public, no-cache')
+        with assert_max_queries(0):
+            res=self.client().get('/questions?page=1', headers={'If-None-Match': res.headers['ETag']})
+        self.assertEqual(res.status_code,304)
+
+    def test_question_write_changes_questions_etag(self):
+        etag=self.client().get('/questions?page=1').headers['ETag']
+        res=self.client().post('/questions',json=self.new_question)
+        question_id=json.loads(res.data)['id_question']
+        res=self.client().get('/questions?page=1', headers={'If-None-Match': etag})
+        self.client().delete('/questions/{}'.format(question_id))
+        self.assertEqual(res.status_code,200)
+
+    def test_category_write_changes_etag(self):
+        etag=self.client().get('/categories').headers['ETag']
+        with self.app.app_context():
+            category=Category(type='Music')
+            category.insert()
+            res=self.client().get('/categories')
+            category.delete()
+        self.assertEqual(res.status_code,200)
+        self.assertNotEqual(res.headers['ETag'],etag)
+        self.assertIn('Music',json.loads(res.data)['categories'].values())
+
+    #Query budgets: these fail if an endpoint starts running more SQL statements, with the caches warm
+    def test_get_categories_query_budget(self):
+        self.warm_caches()
+        with assert_max_queries(0):
+            res=self.client().get('/categories')
+        self.assertEqual(res.status_code,200)
+
+    def test_get_questions_query_budget(self):
+        self.warm_caches()
+        with assert_max_queries(2):
+            res=self.client().get('/questions?page=1')
+        self.assertEqual(res.status_code,200)
+
+    def test_get_questions_by_category_query_budget(self):
+        self.warm_caches()
+        with assert_max_queries(2):
+            res=self.client().get('/categories/1/questions')
+        self.assertEqual(res.status_code,200)
+
+    def test_search_question_query_budget(self):
+        self.warm_caches()
+        with assert_max_queries(1):
+            res=self.client().post('/questions', json={'searchTerm': 'title'})
+        self.assertEqual(res.status_code,200)
+
+    def test_quizzes_query_budget(self):
+        self.warm_caches()
+        with assert_max_queries(2):
+            res=self.client().post('/quizzes', json={
+                "previous_questions": [9],
+                "quiz_category": {"type":"Entertainment", "id": "5" }
+            })
+        self.assertEqual(res.status_code,200)
+
+    def test_server_timing_header(self):
+        #Start from cold caches, so the count doesn't depend on the tests run before: categories, question counts, page
+        category_cache.invalidate()
+        question_counts.invalidate()
+        with assert_max_queries(3) as stats:
+            res=self.client().get('/questions?page=1')
+        self.assertIn('db;dur=', res.headers['Server-Timing'])
+        self.assertIn('desc="{} queries"'.format(stats.count), res.headers['Server-Timing'])
     
 
 
@@ -0,0 +1,69 @@
+'''
+Benchmark for authenticating a request.
+
+Times requires_auth() of the API's Auth (fsnd_common.auth), from reading
+the Authorization header to handing the payload to the view, with the
+verified-token cache off and on, and the average time of each stage
+(header parse, key lookup, signature verification) from Auth.stats().
+Tokens come from a local TokenIssuer (fsnd_common.issuer), so no request
+goes to Auth0. "distinct tokens" is the share of requests carrying a token
+not seen before: 0% is one client polling with its token, 100% a new
+token on every request, where the cache can't help.
+
+    python -m benchmarks.bench_auth [requests]
+'''
+import random
+import sys
+import time
+from flask import Flask
+from fsnd_common.auth import Auth
+from fsnd_common.bench import report
+from fsnd_common.issuer import TokenIssuer
+from fsnd_common.tokens import TokenCache
+from src.auth.auth import AUTH0_DOMAIN, API_AUDIENCE
+
+REQUESTS = 1000
+DISTINCT = [0.0, 0.1, 1.0]
+
+
+def run(app, tokens, view):
+    # per-request times in microseconds
+    times = []
+    for token in tokens:
+        with app.test_request_context(headers={'Authorization': 'Bearer ' + token}):
+            start = time.perf_counter()
+            view()
+            times.append((time.perf_counter() - start) * 1e6)
+    return times
+
+
+def stage_means(stats):
+    return ['{:.1f}'.format(stats[stage]['ms'] * 1000 / stats[stage]['count']) if stats[stage]['count'] else '-'
+            for stage in ('header', 'keys', 'verify')]
+
+
+def main(requests):
+    issuer = TokenIssuer(AUTH0_DOMAIN, API_AUDIENCE)
+    keys = issuer.keys()
+    rnd = random.Random(0)
+    rows = []
+    for distinct in DISTINCT:
+        pool = [issuer.mint(['get:drinks-detail'], subject='bench|{}'.format(n))
+                for n in range(max(1, int(requests * distinct)))]
+        tokens = [pool[0]] * requests if distinct == 0 else [pool[i % len(pool)] for i in range(requests)]
+        rnd.shuffle(tokens)
+        for maxsize in (0, 10000):
+            app = Flask(__name__)
+            auth = Auth(app, domain=AUTH0_DOMAIN, audience=API_AUDIENCE, keys=keys,
+                        tokens=TokenCache(keys, maxsize=maxsize))
+            view = auth.requires_auth('get:drinks-detail')(lambda payload: payload)
+            times = sorted(run(app, tokens, view))
+            stats = auth.stats()
+            rows.append(['{:.0%}'.format(distinct), 'on' if maxsize else 'off',
+                         sum(times) / len(times), times[len(times) // 2], times[int(len(times) * 0.99)],
+                         '{:.0%}'.format(stats['tokens']['hit_rate'])] + stage_means(stats))
+    report('requires_auth, {} requests, microseconds per request'.format(requests),
+           ['distinct tokens', 'cache', 'mean', 'p50', 'p99', 'hit rate', 'header', 'keys', 'verify'], rows)
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if sys.argv[1:] else REQUESTS)
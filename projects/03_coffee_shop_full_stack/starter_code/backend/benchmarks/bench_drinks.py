@@ -0,0 +1,66 @@
+'''
+Benchmark for the drink listings.
+
+Times GET /drinks (Drink.short()) and GET /drinks-detail (Drink.long())
+as the views run them: load every drink, project it and serialize the
+response. "before" reproduces the former projections, which parsed the
+recipe JSON twice in short() and printed it; "after" goes through
+parse_recipe() and short_recipe() of the model, measured warm as in a
+serving process, where every distinct recipe has been parsed once.
+"twice" projects every drink a second time, as a write endpoint returning
+drink.long() does. What is left of "after" is loading the rows, copying
+the cached recipes out and serializing the response; for /drinks-detail
+the copy costs about as much as the parse it replaces.
+
+    python -m benchmarks.bench_drinks [sizes...]
+'''
+import io
+import json
+import sys
+from contextlib import redirect_stdout
+from flask import jsonify
+from fsnd_common.bench import report
+from benchmarks.common import make_app, seed, best_of
+from src.database.models import Drink
+
+SIZES = [1000, 10000]
+
+
+def legacy_short(drink):
+    print(json.loads(drink.recipe))
+    short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in json.loads(drink.recipe)]
+    return {'id': drink.id, 'title': drink.title, 'recipe': short_recipe}
+
+
+def legacy_long(drink):
+    return {'id': drink.id, 'title': drink.title, 'recipe': json.loads(drink.recipe)}
+
+
+def listing(project, times=1):
+    def run():
+        drinks = Drink.query.all()
+        for _ in range(times):
+            response = jsonify({'success': True, 'drinks': [project(drink) for drink in drinks]})
+        return response
+    return run
+
+
+def main(sizes):
+    app = make_app()
+    rows = []
+    with app.app_context(), app.test_request_context():
+        for size in sizes:
+            seed(size)
+            # The old short() printed every recipe; keep that cost without
+            # flooding the terminal.
+            with redirect_stdout(io.StringIO()):
+                rows.append([size, '/drinks', best_of(listing(legacy_short)), best_of(listing(Drink.short)),
+                             best_of(listing(legacy_short, 2)), best_of(listing(Drink.short, 2))])
+            rows.append([size, '/drinks-detail', best_of(listing(legacy_long)), best_of(listing(Drink.long)),
+                         best_of(listing(legacy_long, 2)), best_of(listing(Drink.long, 2))])
+    report('Drink listings, ms (best of 5)',
+           ['drinks', 'endpoint', 'before', 'after', 'before twice', 'after twice'], rows)
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
@@ -0,0 +1,62 @@
+'''
+Shared helpers for the Coffee Shop benchmarks.
+
+The benchmarks run the real models against a throwaway SQLite database,
+so src/database/database.db is never touched. Run them from the backend
+directory:
+
+    python -m benchmarks.<name>
+'''
+import json
+import random
+import time
+from flask import Flask
+from src.database.models import db, Drink
+
+COLORS = ['black', 'brown', 'white', 'grey', 'blue', 'green', 'red', 'yellow']
+INGREDIENTS = ['espresso', 'water', 'milk', 'foam', 'chocolate', 'cream', 'syrup', 'ice']
+
+
+def make_app(database_uri='sqlite://'):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def recipe(rnd):
+    return [{
+        'name': rnd.choice(INGREDIENTS),
+        'color': rnd.choice(COLORS),
+        'parts': rnd.randint(1, 3),
+    } for _ in range(rnd.randint(1, 4))]
+
+
+def seed(num_drinks, seed=0):
+    '''
+    seed(num_drinks)
+        drops and recreates the tables and fills them with drinks of one
+        to four ingredients each.
+    '''
+    rnd = random.Random(seed)
+    db.drop_all()
+    db.create_all()
+    db.session.execute(Drink.__table__.insert(), [{
+        'id': i + 1,
+        'title': 'Drink {}'.format(i + 1),
+        'recipe': json.dumps(recipe(rnd)),
+    } for i in range(num_drinks)])
+    db.session.commit()
+
+
+def best_of(fn, repeat=5):
+    # best wall time of fn in milliseconds, each run with a clean session
+    best = None
+    for _ in range(repeat):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
@@ -0,0 +1,222 @@
+'''
+Load test of the protected Coffee Shop endpoints, offline.
+
+A local TokenIssuer (fsnd_common.issuer) stands in for Auth0: the API
+verifies tokens against its key set through AUTH0_JWKS_FILE, and every
+client thread sends its own token granting all the drink permissions, as
+a logged-in manager would. The API runs on a scratch SQLite database
+(DATABASE_URL), never on src/database/database.db, seeded with --drinks
+drinks to read and patch plus the drinks the DELETE requests remove.
+
+The mix covers GET /drinks (public, for reference), GET /drinks-detail,
+POST /drinks, PATCH /drinks/<id> and DELETE /drinks/<id>. It runs twice,
+with the verified-token cache off and on, and reports per endpoint the
+p50/p95/p99 latency, the time spent authenticating (from the auth entry
+of Server-Timing) and the throughput. Requests go through the Flask test
+client, or over HTTP to a threaded WSGI server with --server.
+
+    python -m benchmarks.loadtest --concurrency 8 --requests 2000
+'''
+import argparse
+import http.client
+import itertools
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import make_server
+from fsnd_common.issuer import TokenIssuer
+from fsnd_common.tokens import TokenCache
+from src.auth.auth import AUTH0_DOMAIN, API_AUDIENCE
+
+PERMISSIONS = ['get:drinks-detail', 'post:drinks', 'patch:drinks', 'delete:drinks']
+AUTH = re.compile(r'(?:^|,\s*)auth;dur=([\d.]+)')
+
+
+class Mix:
+    '''
+    Mix(num_drinks, deletable, recipe)
+        {endpoint: function(rnd) -> (method, path, body, authorized)} of
+        the request mix. Titles are unique, and every DELETE takes a drink
+        of its own from the `deletable` ids.
+    '''
+    def __init__(self, num_drinks, deletable, recipe):
+        self.num_drinks = num_drinks
+        self.deletable = iter(deletable)
+        self.recipe = recipe
+        self.serial = itertools.count()
+        self.lock = threading.Lock()
+
+    def title(self):
+        with self.lock:
+            return 'Load test {}'.format(next(self.serial))
+
+    def delete(self, rnd):
+        with self.lock:
+            # Past the last one, a missing drink: counted as an error.
+            id = next(self.deletable, 0)
+        return 'DELETE', '/drinks/{}'.format(id), None, True
+
+    def scenarios(self):
+        return {
+            'GET /drinks': lambda rnd: ('GET', '/drinks', None, False),
+            'GET /drinks-detail': lambda rnd: ('GET', '/drinks-detail', None, True),
+            'POST /drinks': lambda rnd: ('POST', '/drinks', {
+                'title': self.title(), 'recipe': self.recipe(rnd)}, True),
+            'PATCH /drinks/<id>': lambda rnd: ('PATCH', '/drinks/{}'.format(rnd.randint(1, self.num_drinks)), {
+                'title': self.title(), 'recipe': self.recipe(rnd)}, True),
+            'DELETE /drinks/<id>': self.delete,
+        }
+
+
+class TestClientTarget:
+    # Requests through the Flask test client, one client per thread.
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def request(self, method, path, body, headers):
+        if not hasattr(self.local, 'client'):
+            self.local.client = self.app.test_client()
+        response = self.local.client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.headers.get('Server-Timing', '')
+
+    def close(self):
+        pass
+
+
+class ServerTarget:
+    # Requests over HTTP to a threaded WSGI server on a free local port.
+
+    def __init__(self, app):
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.local = threading.local()
+
+    def request(self, method, path, body, headers):
+        if not hasattr(self.local, 'connection'):
+            self.local.connection = http.client.HTTPConnection('127.0.0.1', self.server.server_port)
+        headers = dict(headers)
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        self.local.connection.request(method, path, body, headers)
+        response = self.local.connection.getresponse()
+        response.read()
+        return response.status, response.getheader('Server-Timing', '')
+
+    def close(self):
+        self.server.shutdown()
+
+
+def percentile(samples, p):
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100, method='inclusive')[p - 1]
+
+
+def run(target, scenarios, tokens, total, concurrency, seed=0):
+    '''
+    run(target, scenarios, tokens, total, concurrency)
+        sends `total` requests drawn from `scenarios` from `concurrency`
+        threads, thread n with tokens[n], and returns
+        ({endpoint: [(ms, auth ms, status)]}, elapsed seconds).
+    '''
+    names = sorted(scenarios)
+    results = dict((name, []) for name in names)
+    lock = threading.Lock()
+
+    def worker(n):
+        rnd = random.Random(seed * 1000 + n)
+        bearer = {'Authorization': 'Bearer ' + tokens[n]}
+        for _ in range(n, total, concurrency):
+            name = rnd.choice(names)
+            method, path, body, authorized = scenarios[name](rnd)
+            start = time.perf_counter()
+            status, timing = target.request(method, path, body, bearer if authorized else {})
+            elapsed = (time.perf_counter() - start) * 1000
+            match = AUTH.search(timing)
+            with lock:
+                results[name].append((elapsed, float(match.group(1)) if match else None, status))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for future in [pool.submit(worker, n) for n in range(concurrency)]:
+            future.result()
+    return results, time.perf_counter() - start
+
+
+def report(title, results, elapsed):
+    print(title)
+    columns = ['requests', 'errors', 'p50 ms', 'p95 ms', 'p99 ms', 'auth ms', 'requests/s']
+    print('  {:<24}'.format('endpoint') + ''.join('{:>12}'.format(c) for c in columns))
+    for name, samples in sorted(results.items()):
+        times = [ms for ms, auth, status in samples]
+        auth = [a for ms, a, status in samples if a is not None]
+        errors = sum(1 for ms, a, status in samples if status >= 400)
+        print('  {:<24}'.format(name) + ''.join('{:>12}'.format(v) for v in [
+            len(samples), errors,
+            '{:.2f}'.format(percentile(times, 50)),
+            '{:.2f}'.format(percentile(times, 95)),
+            '{:.2f}'.format(percentile(times, 99)),
+            '{:.3f}'.format(statistics.mean(auth)) if auth else '-',
+            '{:.0f}'.format(len(samples) / elapsed),
+        ]))
+    total = sum(len(samples) for samples in results.values())
+    print('  {} requests in {:.2f} s, {:.0f} requests/s'.format(total, elapsed, total / elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline load test of the protected Coffee Shop endpoints.')
+    parser.add_argument('--drinks', type=int, default=100, help='drinks in the seeded database (%(default)s)')
+    parser.add_argument('--requests', type=int, default=2000, help='requests per run (%(default)s)')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads (%(default)s)')
+    parser.add_argument('--server', action='store_true', help='go through a real WSGI server instead of the test client')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (%(default)s)')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='coffee-loadtest-')
+    issuer = TokenIssuer(AUTH0_DOMAIN, API_AUDIENCE)
+    # Both are read when the API module is imported.
+    os.environ['AUTH0_JWKS_FILE'] = issuer.write_jwks(os.path.join(workdir, 'jwks.json'))
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'drinks.db')
+    from benchmarks.common import seed, recipe
+    from src.api import app
+    from src.auth.auth import auth
+    app.config['SQLTRACE_LOG_LEVEL'] = logging.DEBUG
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    tokens = [issuer.mint(PERMISSIONS, subject='loadtest|{}'.format(n)) for n in range(args.concurrency)]
+    target = ServerTarget(app) if args.server else TestClientTarget(app)
+    try:
+        for cache in ('off', 'on'):
+            # Deletes need drinks of their own, past the ones the other
+            # requests read and patch; a fifth of the mix, with headroom.
+            deletes = args.requests * 2 // 5 + 50
+            with app.app_context():
+                seed(args.drinks + deletes, args.seed)
+            auth.tokens = TokenCache(auth.keys, maxsize=10000 if cache == 'on' else 0)
+            mix = Mix(args.drinks, range(args.drinks + 1, args.drinks + deletes + 1), recipe)
+            # Warm-up: fills the key and parse caches before measuring.
+            run(target, mix.scenarios(), tokens, 50, 1, args.seed + 1)
+            results, elapsed = run(target, mix.scenarios(), tokens, args.requests, args.concurrency, args.seed)
+            report('{} drinks, {} threads, {}, token cache {}'.format(
+                args.drinks, args.concurrency, 'WSGI server' if args.server else 'test client', cache), results, elapsed)
+            print('  token cache: {}'.format(auth.tokens.stats()))
+    finally:
+        target.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
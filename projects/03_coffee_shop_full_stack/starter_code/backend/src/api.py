@@ -5,12 +5,16 @@ import json
 from flask_cors import CORS
 from jose import jwt
 from flask_sqlalchemy import SQLAlchemy
+from fsnd_common.sqltrace import SQLTrace
+from fsnd_common.conditional import conditional
 
-from .database.models import db_drop_and_create_all, setup_db, Drink,db
-from .auth.auth import AuthError, requires_auth
+from .database.models import db_drop_and_create_all, setup_db, Drink,db, table_versions
+from .auth.auth import auth, requires_auth
 
 app = Flask(__name__)
 setup_db(app)
+SQLTrace(app)
+auth.init_app(app)
 CORS(app)
 
 '''
@@ -30,6 +34,7 @@ DONE implement endpoint
         or appropriate status code indicating reason for failure
 '''
 @app.route('/drinks')
+@conditional(table_versions, Drink.__tablename__, cache_control='public, no-cache')
 def get_drinks():
     try:
         drinks=[drink.short() for drink in Drink.query.all()]
@@ -46,6 +51,7 @@ DONE implement endpoint
 '''
 @app.route('/drinks-detail')
 @requires_auth('get:drinks-detail')
+@conditional(table_versions, Drink.__tablename__, cache_control='private, no-cache')
 def get_drinks_datails(payload):
     try:
         drinks=[drink.long() for drink in Drink.query.all()]
@@ -182,11 +188,6 @@ def not_found(error):
 '''
 DONE implement error handler for AuthError
     error handler should conform to general task above 
-'''
-@app.errorhandler(AuthError)
-def error_401(error):
-    return jsonify({
-        'success':False,
-        'error':401,
-        'message':'Unauthorized'
-        }),401
\ No newline at end of file
+    registered by auth.init_app(app): the response keeps the status of the
+    failure (401, 403, 400...) and carries its code and description
+'''
\ No newline at end of file
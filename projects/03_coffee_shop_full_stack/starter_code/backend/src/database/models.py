@@ -1,14 +1,26 @@
 import os
 from sqlalchemy import Column, String, Integer
 from flask_sqlalchemy import SQLAlchemy
+from fsnd_common.conditional import TableVersions
 import json
+from functools import lru_cache
+from types import MappingProxyType
 
 database_filename = "database.db"
 project_dir = os.path.dirname(os.path.abspath(__file__))
-database_path = "sqlite:///{}".format(os.path.join(project_dir, database_filename))
+# DATABASE_URL points the API at another database, e.g. a scratch copy for
+# benchmarks
+database_path = os.environ.get("DATABASE_URL") or "sqlite:///{}".format(os.path.join(project_dir, database_filename))
 
 db = SQLAlchemy()
 
+'''
+table_versions
+    change counters of the tables, bumped by the insert/update/delete
+    methods of the models; the read endpoints derive their ETag from them
+'''
+table_versions = TableVersions()
+
 '''
 setup_db(app)
     binds a flask application and a SQLAlchemy service
@@ -29,6 +41,40 @@ def db_drop_and_create_all():
     db.drop_all()
     db.create_all()
 
+'''
+parse_recipe(recipe) / short_recipe(recipe)
+    the recipe JSON string of a drink parsed, as stored, and its short
+    form: the (color, parts) of its ingredients. Both are kept by string
+    in bounded caches, so every distinct recipe is parsed once per process
+    whichever Drink instance or request asks for it; the short form is
+    only built when short() needs it. The cached values are shared, so
+    they are immutable (tuples for lists, MappingProxyType for objects);
+    short() and long() build fresh lists and dicts from them with thaw().
+'''
+RECIPE_CACHE_SIZE = 16384
+
+def freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType(dict((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+def thaw(value):
+    if isinstance(value, MappingProxyType):
+        return dict((k, thaw(v)) for k, v in value.items())
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+@lru_cache(maxsize=RECIPE_CACHE_SIZE)
+def parse_recipe(recipe):
+    return freeze(json.loads(recipe))
+
+@lru_cache(maxsize=RECIPE_CACHE_SIZE)
+def short_recipe(recipe):
+    return tuple((r['color'], r['parts']) for r in parse_recipe(recipe))
+
 '''
 Drink
 a persistent drink entity, extends the base SQLAlchemy Model
@@ -47,12 +93,10 @@ class Drink(db.Model):
         short form representation of the Drink model
     '''
     def short(self):
-        print(json.loads(self.recipe))
-        short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in json.loads(self.recipe)]
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': short_recipe
+            'recipe': [{'color': color, 'parts': parts} for color, parts in short_recipe(self.recipe)]
         }
 
     '''
@@ -63,7 +107,7 @@ class Drink(db.Model):
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': json.loads(self.recipe)
+            'recipe': thaw(parse_recipe(self.recipe))
         }
 
     '''
@@ -78,6 +122,7 @@ class Drink(db.Model):
     def insert(self):
         db.session.add(self)
         db.session.commit()
+        table_versions.bump(Drink.__tablename__)
 
     '''
     delete()
@@ -90,6 +135,7 @@ class Drink(db.Model):
     def delete(self):
         db.session.delete(self)
         db.session.commit()
+        table_versions.bump(Drink.__tablename__)
 
     '''
     update()
@@ -102,6 +148,7 @@ class Drink(db.Model):
     '''
     def update(self):
         db.session.commit()
+        table_versions.bump(Drink.__tablename__)
 
     def __repr__(self):
-        return json.dumps(self.short())
\ No newline at end of file
+        return '<Drink {} {!r}>'.format(self.id, self.title)
\ No newline at end of file
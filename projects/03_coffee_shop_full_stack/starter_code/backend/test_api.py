@@ -0,0 +1,104 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from fsnd_common.issuer import TokenIssuer
+from src.auth.auth import AUTH0_DOMAIN, API_AUDIENCE
+
+# The API reads its database and signing keys when it is imported: point
+# both at scratch copies, so the tests need neither database.db nor Auth0.
+workdir = tempfile.mkdtemp(prefix='coffee-test-')
+issuer = TokenIssuer(AUTH0_DOMAIN, API_AUDIENCE)
+os.environ['AUTH0_JWKS_FILE'] = issuer.write_jwks(os.path.join(workdir, 'jwks.json'))
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'drinks.db')
+
+from src.api import app
+from src.database.models import db_drop_and_create_all, Drink
+
+MANAGER = ['get:drinks-detail', 'post:drinks', 'patch:drinks', 'delete:drinks']
+
+
+class CoffeeShopTestCase(unittest.TestCase):
+    """This class represents the coffee shop test case"""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.headers = {'Authorization': 'Bearer ' + issuer.mint(MANAGER)}
+        with app.app_context():
+            db_drop_and_create_all()
+            drink = Drink(title='water', recipe=json.dumps([{'name': 'water', 'color': 'blue', 'parts': 1}]))
+            drink.insert()
+            self.drink_id = drink.id
+
+    def test_get_drinks_short(self):
+        res = self.client.get('/drinks')
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['drinks'][0]['recipe'], [{'color': 'blue', 'parts': 1}])
+
+    def test_get_drinks_detail_long(self):
+        res = self.client.get('/drinks-detail', headers=self.headers)
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['drinks'][0]['recipe'], [{'name': 'water', 'color': 'blue', 'parts': 1}])
+
+    def test_long_returns_a_copy(self):
+        with app.app_context():
+            drink = Drink.query.get(self.drink_id)
+            drink.long()['recipe'][0]['color'] = 'red'
+            drink.short()['recipe'].append({'color': 'red', 'parts': 1})
+
+            self.assertEqual(drink.long()['recipe'], [{'name': 'water', 'color': 'blue', 'parts': 1}])
+            self.assertEqual(drink.short()['recipe'], [{'color': 'blue', 'parts': 1}])
+
+    def test_get_drinks_detail_without_token(self):
+        res = self.client.get('/drinks-detail')
+
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(res.get_json()['code'], 'authorization_header_missing')
+
+    def test_get_drinks_detail_blank_header(self):
+        res = self.client.get('/drinks-detail', headers={'Authorization': '   '})
+
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(res.get_json()['code'], 'invalid_header')
+
+    def test_patch_title_only(self):
+        # The stock Postman request sends no recipe: the drink keeps its
+        # long form serializable and the detail listing keeps working.
+        res = self.client.patch('/drinks/{}'.format(self.drink_id), json={'title': 'sparkling water'},
+                                headers=self.headers)
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['drinks'][0]['title'], 'sparkling water')
+
+        res = self.client.get('/drinks-detail', headers=self.headers)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['drinks'][0]['title'], 'sparkling water')
+
+    def test_post_drink_with_dict_recipe(self):
+        recipe = {'name': 'milk', 'color': 'white', 'parts': 1}
+        res = self.client.post('/drinks', json={'title': 'milk', 'recipe': recipe}, headers=self.headers)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['drinks'][0]['recipe'], recipe)
+
+    def test_post_drink_without_permission(self):
+        headers = {'Authorization': 'Bearer ' + issuer.mint(['get:drinks-detail'])}
+        res = self.client.post('/drinks', json={'title': 'tea', 'recipe': []}, headers=headers)
+
+        self.assertEqual(res.status_code, 403)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()